@@ -7,10 +7,52 @@ from dotenv import load_dotenv
 class Config:
     bot_token: str
     database_path: str = "bot_database.db"
+    database_backend: str = "sqlite"
+    database_url: str = ""
+    database_pool_size: int = 4
+    profile_cache_size: int = 10000
+    profile_cache_ttl: float = 30.0
     log_level: str = "INFO"
     api_id: str = ""
     api_hash: str = ""
     phone_number: str = ""
+    telegram_workers: int = 1
+    telegram_health_interval: float = 60.0
+    telegram_rate: float = 0.5
+    telegram_burst: float = 3.0
+    telegram_max_rate: float = 2.0
+    telegram_entity_ttl: float = 7 * 86400
+    fetch_concurrency: int = 20
+    fetch_per_host: int = 4
+    fetch_timeout: float = 20.0
+    fetch_cache_ttl: float = 300.0
+    http_timeout: float = 15.0
+    http_connect_timeout: float = 5.0
+    http_pool_limit: int = 100
+    feed_parser: str = "stream"
+    ingestion_interval: int = 60
+    poll_min_interval: int = 300
+    poll_max_interval: int = 3600
+    items_retention_days: int = 7
+    item_writer_batch_size: int = 2000
+    item_writer_flush_interval: float = 0.2
+    digest_window_hours: int = 48
+    digest_candidate_limit: int = 300
+    relevance_refit_interval: int = 1800
+    relevance_corpus_size: int = 20000
+    relevance_max_features: int = 50000
+    relevance_cache_size: int = 50000
+    relevance_cache_dir: str = "relevance_cache"
+    cpu_workers: int = 0
+    cpu_executor: str = "process"
+    digest_batch_size: int = 500
+    digest_slot_workers: int = 4
+    instance_id: str = ""
+    slot_poll_interval: float = 15.0
+    slot_lease_ttl: float = 60.0
+    delivery_rate: float = 25.0
+    delivery_chat_interval: float = 1.0
+    delivery_group_interval: float = 3.0
 
 
 def load_config() -> Config:
@@ -19,17 +61,106 @@ def load_config() -> Config:
     if not token:
         raise RuntimeError("BOT_TOKEN is not set in environment")
     database_path = os.getenv("DATABASE_PATH", "bot_database.db")
+    # sqlite — один процесс; postgres — общее состояние для нескольких процессов
+    database_backend = os.getenv("DATABASE_BACKEND", "sqlite").lower()
+    database_url = os.getenv("DATABASE_URL", "")
+    database_pool_size = int(os.getenv("DATABASE_POOL_SIZE", "4"))
+    profile_cache_size = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+    # Сколько секунд процесс может не видеть изменений профиля, сделанных другим процессом
+    profile_cache_ttl = float(os.getenv("PROFILE_CACHE_TTL", "30"))
     log_level = os.getenv("LOG_LEVEL", "INFO")
     api_id = os.getenv("API_ID", "")
     api_hash = os.getenv("API_HASH", "")
     phone_number = os.getenv("PHONE_NUMBER", "")
+    telegram_workers = int(os.getenv("TELEGRAM_WORKERS", "1"))
+    telegram_health_interval = float(os.getenv("TELEGRAM_HEALTH_INTERVAL", "60"))
+    telegram_rate = float(os.getenv("TELEGRAM_RATE", "0.5"))
+    telegram_burst = float(os.getenv("TELEGRAM_BURST", "3"))
+    telegram_max_rate = float(os.getenv("TELEGRAM_MAX_RATE", "2"))
+    telegram_entity_ttl = float(os.getenv("TELEGRAM_ENTITY_TTL", str(7 * 86400)))
+    fetch_concurrency = int(os.getenv("FETCH_CONCURRENCY", "20"))
+    fetch_per_host = int(os.getenv("FETCH_PER_HOST", "4"))
+    fetch_timeout = float(os.getenv("FETCH_TIMEOUT", "20"))
+    fetch_cache_ttl = float(os.getenv("FETCH_CACHE_TTL", "300"))
+    http_timeout = float(os.getenv("HTTP_TIMEOUT", "15"))
+    http_connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    http_pool_limit = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+    # stream — потоковый разбор лент с ранней остановкой; feedparser — целиком
+    feed_parser = os.getenv("FEED_PARSER", "stream").lower()
+    ingestion_interval = int(os.getenv("INGESTION_INTERVAL", "60"))
+    poll_min_interval = int(os.getenv("POLL_MIN_INTERVAL", "300"))
+    poll_max_interval = int(os.getenv("POLL_MAX_INTERVAL", "3600"))
+    items_retention_days = int(os.getenv("ITEMS_RETENTION_DAYS", "7"))
+    item_writer_batch_size = int(os.getenv("ITEM_WRITER_BATCH_SIZE", "2000"))
+    item_writer_flush_interval = float(os.getenv("ITEM_WRITER_FLUSH_INTERVAL", "0.2"))
+    digest_window_hours = int(os.getenv("DIGEST_WINDOW_HOURS", "48"))
+    digest_candidate_limit = int(os.getenv("DIGEST_CANDIDATE_LIMIT", "300"))
+    relevance_refit_interval = int(os.getenv("RELEVANCE_REFIT_INTERVAL", "1800"))
+    relevance_corpus_size = int(os.getenv("RELEVANCE_CORPUS_SIZE", "20000"))
+    relevance_max_features = int(os.getenv("RELEVANCE_MAX_FEATURES", "50000"))
+    relevance_cache_size = int(os.getenv("RELEVANCE_CACHE_SIZE", "50000"))
+    relevance_cache_dir = os.getenv("RELEVANCE_CACHE_DIR", "relevance_cache")
+    # Пул для разбора страниц и TF-IDF: process — по процессу на ядро, thread — потоки
+    cpu_workers = int(os.getenv("CPU_WORKERS", "0"))
+    cpu_executor = os.getenv("CPU_EXECUTOR", "process").lower()
+    digest_batch_size = int(os.getenv("DIGEST_BATCH_SIZE", "500"))
+    digest_slot_workers = int(os.getenv("DIGEST_SLOT_WORKERS", "4"))
+    # Имя процесса в арендах общего расписания; по умолчанию host:pid
+    instance_id = os.getenv("INSTANCE_ID", "")
+    slot_poll_interval = float(os.getenv("SLOT_POLL_INTERVAL", "15"))
+    slot_lease_ttl = float(os.getenv("SLOT_LEASE_TTL", "60"))
+    delivery_rate = float(os.getenv("DELIVERY_RATE", "25"))
+    delivery_chat_interval = float(os.getenv("DELIVERY_CHAT_INTERVAL", "1"))
+    delivery_group_interval = float(os.getenv("DELIVERY_GROUP_INTERVAL", "3"))
     return Config(
         bot_token=token, 
         database_path=database_path, 
+        database_backend=database_backend,
+        database_url=database_url,
+        database_pool_size=database_pool_size,
+        profile_cache_size=profile_cache_size,
+        profile_cache_ttl=profile_cache_ttl,
         log_level=log_level,
         api_id=api_id,
         api_hash=api_hash,
-        phone_number=phone_number
+        phone_number=phone_number,
+        telegram_workers=telegram_workers,
+        telegram_health_interval=telegram_health_interval,
+        telegram_rate=telegram_rate,
+        telegram_burst=telegram_burst,
+        telegram_max_rate=telegram_max_rate,
+        telegram_entity_ttl=telegram_entity_ttl,
+        fetch_concurrency=fetch_concurrency,
+        fetch_per_host=fetch_per_host,
+        fetch_timeout=fetch_timeout,
+        fetch_cache_ttl=fetch_cache_ttl,
+        http_timeout=http_timeout,
+        http_connect_timeout=http_connect_timeout,
+        http_pool_limit=http_pool_limit,
+        feed_parser=feed_parser,
+        ingestion_interval=ingestion_interval,
+        poll_min_interval=poll_min_interval,
+        poll_max_interval=poll_max_interval,
+        items_retention_days=items_retention_days,
+        item_writer_batch_size=item_writer_batch_size,
+        item_writer_flush_interval=item_writer_flush_interval,
+        digest_window_hours=digest_window_hours,
+        digest_candidate_limit=digest_candidate_limit,
+        relevance_refit_interval=relevance_refit_interval,
+        relevance_corpus_size=relevance_corpus_size,
+        relevance_max_features=relevance_max_features,
+        relevance_cache_size=relevance_cache_size,
+        relevance_cache_dir=relevance_cache_dir,
+        cpu_workers=cpu_workers,
+        cpu_executor=cpu_executor,
+        digest_batch_size=digest_batch_size,
+        digest_slot_workers=digest_slot_workers,
+        instance_id=instance_id,
+        slot_poll_interval=slot_poll_interval,
+        slot_lease_ttl=slot_lease_ttl,
+        delivery_rate=delivery_rate,
+        delivery_chat_interval=delivery_chat_interval,
+        delivery_group_interval=delivery_group_interval,
     )
 
 
@@ -0,0 +1,15 @@
+"""Storage backends."""
+
+from .base import StorageBackend
+from .sqlite import SQLiteBackend
+
+
+def create_backend(config) -> StorageBackend:
+    """Хранилище, выбранное в конфигурации (DATABASE_BACKEND)"""
+    if config.database_backend == "sqlite":
+        return SQLiteBackend(config.database_path, pool_size=config.database_pool_size)
+    if config.database_backend == "postgres":
+        # asyncpg нужен только для этого хранилища
+        from .postgres import PostgresBackend
+        return PostgresBackend(config.database_url, pool_size=config.database_pool_size)
+    raise ValueError(f"Unknown database backend: {config.database_backend}")
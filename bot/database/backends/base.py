@@ -0,0 +1,218 @@
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def interest_terms(interests: List[str]) -> List[Tuple[str, bool]]:
+    """
+    Слова интересов для полнотекстового поиска: (слово, искать ли по префиксу)
+
+    Длинные слова ищутся по префиксу без окончания, чтобы находить
+    другие словоформы ("технологии" -> "технолог*").
+    """
+    terms = []
+    for interest in interests:
+        for word in _WORD_RE.findall(interest.lower()):
+            if len(word) < 2:
+                continue
+            if len(word) >= 6:
+                terms.append((word[:-2], True))
+            else:
+                terms.append((word, False))
+    return list(dict.fromkeys(terms))
+
+
+class StorageBackend(ABC):
+    """
+    Хранилище состояния бота: пользователи, подписки, интересы, записи источников
+    и служебные данные парсеров
+
+    Реализации получают уже нормализованные значения; кэширование и значения
+    по умолчанию остаются в bot.database.db.
+    """
+
+    @abstractmethod
+    async def open(self) -> None:
+        """Применяет миграции схемы и открывает соединения"""
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+    # Users
+    @abstractmethod
+    async def add_user(self, user_id: int, chat_id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def get_user(self, user_id: int) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    async def get_schedule_slots(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    async def get_slot_users(self, slot: str, after_user_id: int, limit: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def update_schedule(self, user_id: int, schedule: Optional[str]) -> None:
+        ...
+
+    # Digest slots
+    @abstractmethod
+    async def save_digest_slot(self, slot: str, next_run_at: float) -> None:
+        """Добавляет слот рассылки; время уже известного слота не меняется"""
+
+    @abstractmethod
+    async def claim_digest_slots(self, owner: str, now: float, lease_until: float, limit: int) -> List[Dict]:
+        """
+        Выдает owner в аренду до lease_until слоты, которые пора запускать
+        и которые никто не держит (или чья аренда истекла)
+
+        Returns:
+            Записи slot, next_run_at
+        """
+
+    @abstractmethod
+    async def renew_slot_lease(self, slot: str, owner: str, lease_until: float) -> bool:
+        """
+        Returns:
+            False, если аренда уже перешла к другому владельцу
+        """
+
+    @abstractmethod
+    async def complete_digest_slot(self, slot: str, owner: str, next_run_at: float) -> None:
+        """Переносит слот на следующий запуск, снимает аренду и чистит журнал доставки"""
+
+    @abstractmethod
+    async def release_digest_slot(self, slot: str, owner: str) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_digest_slot(self, slot: str, owner: str) -> bool:
+        """
+        Удаляет слот, если на это время больше никто не подписан
+
+        Returns:
+            True, если слот удален
+        """
+
+    @abstractmethod
+    async def get_delivered_users(self, slot: str, run_at: float, user_ids: List[int]) -> List[int]:
+        ...
+
+    @abstractmethod
+    async def mark_delivered(self, slot: str, run_at: float, user_ids: List[int]) -> None:
+        ...
+
+    # Sources
+    @abstractmethod
+    async def add_source(self, user_id: int, type_: str, url: str) -> None:
+        ...
+
+    @abstractmethod
+    async def get_user_sources(self, user_id: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def delete_source(self, source_id: int, user_id: int) -> None:
+        ...
+
+    # Interests
+    @abstractmethod
+    async def add_interest(self, user_id: int, interest_text: str) -> None:
+        ...
+
+    @abstractmethod
+    async def get_user_interests(self, user_id: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def delete_interest(self, interest_id: int, user_id: int) -> None:
+        ...
+
+    # HTTP cache
+    @abstractmethod
+    async def get_http_cache(self, url: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    async def save_http_cache(
+            self,
+            url: str,
+            etag: Optional[str],
+            last_modified: Optional[str],
+            items: List[Dict],
+    ) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_http_cache(self, url: str) -> None:
+        ...
+
+    # Feeds
+    @abstractmethod
+    async def get_due_feeds(self, now: float, limit: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def update_feed_poll(self, feed_id: int, polled_at: float, poll_interval: int) -> List[int]:
+        """
+        Returns:
+            Подписчики источника, если он опрошен впервые, иначе пустой список
+        """
+
+    # Items
+    @abstractmethod
+    async def save_items_batch(self, batches: List[Tuple[int, List[Dict], float]]) -> List[int]:
+        ...
+
+    @abstractmethod
+    async def get_user_items(self, user_id: int, since: float, limit: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def search_user_items(self, user_id: int, interests: List[str], since: float, limit: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def get_recent_items(self, since: float, limit: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def delete_old_items(self, before: float) -> None:
+        ...
+
+    # Telegram
+    @abstractmethod
+    async def get_telegram_watermark(self, channel: str) -> int:
+        ...
+
+    @abstractmethod
+    async def set_telegram_watermark(self, channel: str, last_message_id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def get_telegram_entity(self, handle: str, resolved_after: float) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    async def save_telegram_entity(
+            self,
+            handle: str,
+            kind: str,
+            peer_id: int,
+            access_hash: Optional[int],
+            title: Optional[str],
+            username: Optional[str],
+            resolved_at: float,
+    ) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_telegram_entity(self, handle: str) -> None:
+        ...
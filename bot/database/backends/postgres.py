@@ -0,0 +1,483 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+
+from .base import StorageBackend, interest_terms
+
+# Схема PostgreSQL по версиям; примененные версии хранятся в schema_migrations
+MIGRATIONS = [
+    # 1: базовая схема
+    [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            chat_id BIGINT UNIQUE NOT NULL,
+            schedule TEXT,
+            created_at TIMESTAMPTZ DEFAULT now()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS feeds (
+            feed_id BIGSERIAL PRIMARY KEY,
+            type TEXT NOT NULL CHECK (type IN ('rss','website','telegram')),
+            url TEXT NOT NULL,
+            poll_interval INTEGER NOT NULL DEFAULT 900,
+            last_polled_at DOUBLE PRECISION,
+            next_poll_at DOUBLE PRECISION,
+            created_at TIMESTAMPTZ DEFAULT now(),
+            UNIQUE (type, url)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS sources (
+            source_id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+            type TEXT NOT NULL CHECK (type IN ('rss','website','telegram')),
+            url TEXT NOT NULL,
+            feed_id BIGINT REFERENCES feeds(feed_id),
+            added_at TIMESTAMPTZ DEFAULT now()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS interests (
+            interest_id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+            interest_text TEXT NOT NULL,
+            added_at TIMESTAMPTZ DEFAULT now()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            items TEXT NOT NULL DEFAULT '[]',
+            fetched_at TIMESTAMPTZ DEFAULT now()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS items (
+            item_id BIGSERIAL PRIMARY KEY,
+            feed_id BIGINT NOT NULL REFERENCES feeds(feed_id) ON DELETE CASCADE,
+            type TEXT NOT NULL,
+            link TEXT NOT NULL,
+            title TEXT,
+            summary TEXT,
+            published TEXT,
+            source TEXT,
+            fetched_at DOUBLE PRECISION NOT NULL,
+            search tsvector GENERATED ALWAYS AS (
+                to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(summary, ''))
+            ) STORED,
+            UNIQUE (feed_id, link)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_items_feed_fetched ON items(feed_id, fetched_at)",
+        "CREATE INDEX IF NOT EXISTS idx_items_search ON items USING GIN (search)",
+        """
+        CREATE TABLE IF NOT EXISTS telegram_watermarks (
+            channel TEXT PRIMARY KEY,
+            last_message_id BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ DEFAULT now()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS telegram_entities (
+            handle TEXT PRIMARY KEY,
+            kind TEXT NOT NULL CHECK (kind IN ('channel','chat')),
+            peer_id BIGINT NOT NULL,
+            access_hash BIGINT,
+            title TEXT,
+            username TEXT,
+            resolved_at DOUBLE PRECISION NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sources_user_added ON sources(user_id, added_at)",
+        "CREATE INDEX IF NOT EXISTS idx_sources_feed ON sources(feed_id)",
+        "CREATE INDEX IF NOT EXISTS idx_interests_user_added ON interests(user_id, added_at)",
+        "CREATE INDEX IF NOT EXISTS idx_users_schedule ON users(schedule) WHERE schedule IS NOT NULL",
+    ],
+    # 2: постраничный обход пользователей слота рассылки
+    [
+        "CREATE INDEX IF NOT EXISTS idx_users_schedule_user ON users(schedule, user_id) WHERE schedule IS NOT NULL",
+    ],
+    # 3: общее для нескольких процессов расписание рассылки и журнал доставки
+    [
+        """
+        CREATE TABLE IF NOT EXISTS digest_slots (
+            slot TEXT PRIMARY KEY,
+            next_run_at DOUBLE PRECISION NOT NULL,
+            lease_owner TEXT,
+            lease_until DOUBLE PRECISION
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_digest_slots_due ON digest_slots(next_run_at)",
+        """
+        CREATE TABLE IF NOT EXISTS digest_deliveries (
+            slot TEXT NOT NULL,
+            run_at DOUBLE PRECISION NOT NULL,
+            user_id BIGINT NOT NULL,
+            PRIMARY KEY (slot, run_at, user_id)
+        )
+        """,
+    ],
+]
+
+# Ключ advisory-блокировки, чтобы миграции применял только один из одновременно стартующих узлов
+_MIGRATION_LOCK = 7_302_215
+
+# Сколько секунд источник, выданный одному воркеру опроса, не выдается другим
+_POLL_LEASE = 300
+
+_ITEM_COLUMNS = "i.item_id, i.feed_id, i.type, i.link, i.title, i.summary, i.published, i.source, i.fetched_at"
+
+
+def build_tsquery(interests: List[str]) -> str:
+    """Запрос to_tsquery: любое слово любого интереса"""
+    return " | ".join(f"{word}:*" if prefix else word for word, prefix in interest_terms(interests))
+
+
+class PostgresBackend(StorageBackend):
+    """
+    Хранилище в PostgreSQL, общее для нескольких процессов бота и воркеров опроса
+
+    Args:
+        dsn: Строка подключения postgresql://...
+        pool_size: Максимальное количество соединений в пуле
+    """
+
+    def __init__(self, dsn: str, pool_size: int = 10):
+        self.dsn = dsn
+        self.pool_size = pool_size
+        self._pool: Optional[asyncpg.Pool] = None
+
+    async def open(self) -> None:
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.pool_size)
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", _MIGRATION_LOCK)
+                await conn.execute(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    "version INTEGER PRIMARY KEY, applied_at TIMESTAMPTZ DEFAULT now())"
+                )
+                version = await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+                for number, statements in enumerate(MIGRATIONS, start=1):
+                    if number <= version:
+                        continue
+                    for sql in statements:
+                        await conn.execute(sql)
+                    await conn.execute("INSERT INTO schema_migrations(version) VALUES ($1)", number)
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    def _get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            raise RuntimeError("PostgreSQL backend is not open")
+        return self._pool
+
+    async def _fetchall(self, sql: str, *args) -> List[Dict]:
+        rows = await self._get_pool().fetch(sql, *args)
+        return [dict(r) for r in rows]
+
+    async def _fetchone(self, sql: str, *args) -> Optional[Dict]:
+        row = await self._get_pool().fetchrow(sql, *args)
+        return dict(row) if row else None
+
+    async def _execute(self, sql: str, *args) -> None:
+        await self._get_pool().execute(sql, *args)
+
+    # Users
+    async def add_user(self, user_id: int, chat_id: int) -> None:
+        await self._execute(
+            "INSERT INTO users(user_id, chat_id) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+            user_id, chat_id,
+        )
+
+    async def get_user(self, user_id: int) -> Optional[Dict]:
+        return await self._fetchone("SELECT * FROM users WHERE user_id = $1", user_id)
+
+    async def get_schedule_slots(self) -> List[str]:
+        rows = await self._fetchall("SELECT DISTINCT schedule FROM users WHERE schedule IS NOT NULL")
+        return [r["schedule"] for r in rows]
+
+    async def get_slot_users(self, slot: str, after_user_id: int, limit: int) -> List[Dict]:
+        return await self._fetchall(
+            "SELECT user_id, chat_id FROM users WHERE schedule = $1 AND user_id > $2 ORDER BY user_id LIMIT $3",
+            slot, after_user_id, limit,
+        )
+
+    async def update_schedule(self, user_id: int, schedule: Optional[str]) -> None:
+        await self._execute("UPDATE users SET schedule = $1 WHERE user_id = $2", schedule, user_id)
+
+    # Digest slots
+    async def save_digest_slot(self, slot: str, next_run_at: float) -> None:
+        await self._execute(
+            "INSERT INTO digest_slots(slot, next_run_at) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+            slot, next_run_at,
+        )
+
+    async def claim_digest_slots(self, owner: str, now: float, lease_until: float, limit: int) -> List[Dict]:
+        return await self._fetchall(
+            "UPDATE digest_slots SET lease_owner = $1, lease_until = $2 WHERE slot IN ("
+            "SELECT slot FROM digest_slots WHERE next_run_at <= $3 "
+            "AND (lease_until IS NULL OR lease_until < $3) ORDER BY next_run_at LIMIT $4 FOR UPDATE SKIP LOCKED"
+            ") RETURNING slot, next_run_at",
+            owner, lease_until, now, limit,
+        )
+
+    async def renew_slot_lease(self, slot: str, owner: str, lease_until: float) -> bool:
+        renewed = await self._get_pool().fetchval(
+            "UPDATE digest_slots SET lease_until = $1 WHERE slot = $2 AND lease_owner = $3 RETURNING 1",
+            lease_until, slot, owner,
+        )
+        return renewed is not None
+
+    async def complete_digest_slot(self, slot: str, owner: str, next_run_at: float) -> None:
+        async with self._get_pool().acquire() as conn:
+            async with conn.transaction():
+                completed = await conn.fetchval(
+                    "UPDATE digest_slots SET next_run_at = $1, lease_owner = NULL, lease_until = NULL "
+                    "WHERE slot = $2 AND lease_owner = $3 RETURNING 1",
+                    next_run_at, slot, owner,
+                )
+                # Потерявший аренду процесс не трогает журнал нового владельца
+                if completed is not None:
+                    await conn.execute("DELETE FROM digest_deliveries WHERE slot = $1", slot)
+
+    async def release_digest_slot(self, slot: str, owner: str) -> None:
+        await self._execute(
+            "UPDATE digest_slots SET lease_owner = NULL, lease_until = NULL WHERE slot = $1 AND lease_owner = $2",
+            slot, owner,
+        )
+
+    async def delete_digest_slot(self, slot: str, owner: str) -> bool:
+        async with self._get_pool().acquire() as conn:
+            async with conn.transaction():
+                deleted = await conn.fetchval(
+                    "DELETE FROM digest_slots WHERE slot = $1 AND lease_owner = $2 "
+                    "AND NOT EXISTS (SELECT 1 FROM users WHERE schedule = $1) RETURNING 1",
+                    slot, owner,
+                )
+                if deleted is None:
+                    return False
+                await conn.execute("DELETE FROM digest_deliveries WHERE slot = $1", slot)
+                return True
+
+    async def get_delivered_users(self, slot: str, run_at: float, user_ids: List[int]) -> List[int]:
+        rows = await self._fetchall(
+            "SELECT user_id FROM digest_deliveries WHERE slot = $1 AND run_at = $2 AND user_id = ANY($3::bigint[])",
+            slot, run_at, user_ids,
+        )
+        return [r["user_id"] for r in rows]
+
+    async def mark_delivered(self, slot: str, run_at: float, user_ids: List[int]) -> None:
+        await self._execute(
+            "INSERT INTO digest_deliveries(slot, run_at, user_id) "
+            "SELECT $1, $2, unnest($3::bigint[]) ON CONFLICT DO NOTHING",
+            slot, run_at, user_ids,
+        )
+
+    # Sources
+    async def add_source(self, user_id: int, type_: str, url: str) -> None:
+        async with self._get_pool().acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "INSERT INTO feeds(type, url) VALUES ($1, $2) ON CONFLICT DO NOTHING", type_, url
+                )
+                feed_id = await conn.fetchval("SELECT feed_id FROM feeds WHERE type = $1 AND url = $2", type_, url)
+                # Повторная подписка на тот же источник ничего не меняет
+                await conn.execute(
+                    "INSERT INTO sources(user_id, type, url, feed_id) "
+                    "SELECT $1, $2, $3, $4 WHERE NOT EXISTS "
+                    "(SELECT 1 FROM sources WHERE user_id = $1 AND feed_id = $4)",
+                    user_id, type_, url, feed_id,
+                )
+
+    async def get_user_sources(self, user_id: int) -> List[Dict]:
+        return await self._fetchall(
+            "SELECT s.*, f.last_polled_at, f.poll_interval FROM sources s "
+            "LEFT JOIN feeds f ON f.feed_id = s.feed_id "
+            "WHERE s.user_id = $1 ORDER BY s.added_at DESC",
+            user_id,
+        )
+
+    async def delete_source(self, source_id: int, user_id: int) -> None:
+        await self._execute("DELETE FROM sources WHERE source_id = $1 AND user_id = $2", source_id, user_id)
+
+    # Interests
+    async def add_interest(self, user_id: int, interest_text: str) -> None:
+        await self._execute("INSERT INTO interests(user_id, interest_text) VALUES ($1, $2)", user_id, interest_text)
+
+    async def get_user_interests(self, user_id: int) -> List[Dict]:
+        return await self._fetchall(
+            "SELECT * FROM interests WHERE user_id = $1 ORDER BY added_at DESC", user_id
+        )
+
+    async def delete_interest(self, interest_id: int, user_id: int) -> None:
+        await self._execute("DELETE FROM interests WHERE interest_id = $1 AND user_id = $2", interest_id, user_id)
+
+    # HTTP cache
+    async def get_http_cache(self, url: str) -> Optional[Dict]:
+        cached = await self._fetchone("SELECT * FROM http_cache WHERE url = $1", url)
+        if cached:
+            cached["items"] = json.loads(cached["items"])
+        return cached
+
+    async def save_http_cache(
+            self,
+            url: str,
+            etag: Optional[str],
+            last_modified: Optional[str],
+            items: List[Dict],
+    ) -> None:
+        await self._execute(
+            "INSERT INTO http_cache(url, etag, last_modified, items, fetched_at) "
+            "VALUES ($1, $2, $3, $4, now()) "
+            "ON CONFLICT (url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified, "
+            "items = excluded.items, fetched_at = excluded.fetched_at",
+            url, etag, last_modified, json.dumps(items, ensure_ascii=False),
+        )
+
+    async def delete_http_cache(self, url: str) -> None:
+        await self._execute("DELETE FROM http_cache WHERE url = $1", url)
+
+    # Feeds
+    async def get_due_feeds(self, now: float, limit: int) -> List[Dict]:
+        # Выданные источники сразу откладываются на время аренды, чтобы
+        # параллельные воркеры опроса не брали одни и те же
+        return await self._fetchall(
+            "UPDATE feeds SET next_poll_at = $1 + $3 WHERE feed_id IN ("
+            "SELECT f.feed_id FROM feeds f "
+            "WHERE (f.next_poll_at IS NULL OR f.next_poll_at <= $1) "
+            "AND EXISTS (SELECT 1 FROM sources s WHERE s.feed_id = f.feed_id) "
+            "ORDER BY f.next_poll_at NULLS FIRST LIMIT $2 FOR UPDATE SKIP LOCKED"
+            ") RETURNING *",
+            now, limit, _POLL_LEASE,
+        )
+
+    async def update_feed_poll(self, feed_id: int, polled_at: float, poll_interval: int) -> List[int]:
+        async with self._get_pool().acquire() as conn:
+            async with conn.transaction():
+                first_poll = await conn.fetchval(
+                    "SELECT last_polled_at IS NULL FROM feeds WHERE feed_id = $1 FOR UPDATE", feed_id
+                )
+                await conn.execute(
+                    "UPDATE feeds SET last_polled_at = $1, next_poll_at = $2, poll_interval = $3 WHERE feed_id = $4",
+                    polled_at, polled_at + poll_interval, poll_interval, feed_id,
+                )
+                if not first_poll:
+                    return []
+                rows = await conn.fetch("SELECT user_id FROM sources WHERE feed_id = $1", feed_id)
+                return [r["user_id"] for r in rows]
+
+    # Items
+    async def save_items_batch(self, batches: List[Tuple[int, List[Dict], float]]) -> List[int]:
+        new_counts = []
+        async with self._get_pool().acquire() as conn:
+            async with conn.transaction():
+                for feed_id, items, fetched_at in batches:
+                    # Одна строка на ссылку: ON CONFLICT не может обновить строку дважды
+                    unique = list({it["link"]: it for it in items}.values())
+                    if not unique:
+                        new_counts.append(0)
+                        continue
+                    inserted = await conn.fetchval(
+                        "WITH upserted AS ("
+                        "INSERT INTO items(feed_id, type, link, title, summary, published, source, fetched_at) "
+                        "SELECT $1::bigint, t.type, t.link, t.title, t.summary, t.published, t.source, $8::double precision "
+                        "FROM unnest($2::text[], $3::text[], $4::text[], $5::text[], $6::text[], $7::text[]) "
+                        "AS t(type, link, title, summary, published, source) "
+                        "ON CONFLICT (feed_id, link) DO UPDATE SET title = excluded.title, "
+                        "summary = excluded.summary, published = excluded.published, source = excluded.source "
+                        "WHERE (items.title, items.summary, items.published, items.source) IS DISTINCT FROM "
+                        "(excluded.title, excluded.summary, excluded.published, excluded.source) "
+                        # xmax = 0 только у вставленных строк
+                        "RETURNING (xmax = 0) AS inserted"
+                        ") SELECT count(*) FROM upserted WHERE inserted",
+                        feed_id,
+                        [it["type"] for it in unique],
+                        [it["link"] for it in unique],
+                        [it["title"] for it in unique],
+                        [it["summary"] for it in unique],
+                        [it["published"] for it in unique],
+                        [it["source"] for it in unique],
+                        fetched_at,
+                    )
+                    new_counts.append(inserted)
+        return new_counts
+
+    async def get_user_items(self, user_id: int, since: float, limit: int) -> List[Dict]:
+        return await self._fetchall(
+            f"SELECT {_ITEM_COLUMNS} FROM items i JOIN sources s ON s.feed_id = i.feed_id "
+            "WHERE s.user_id = $1 AND i.fetched_at >= $2 ORDER BY i.fetched_at DESC, i.item_id DESC LIMIT $3",
+            user_id, since, limit,
+        )
+
+    async def search_user_items(self, user_id: int, interests: List[str], since: float, limit: int) -> List[Dict]:
+        query = build_tsquery(interests)
+        if not query:
+            return []
+        return await self._fetchall(
+            f"SELECT {_ITEM_COLUMNS} FROM items i, to_tsquery('simple', $1) q "
+            "WHERE i.search @@ q AND i.fetched_at >= $2 "
+            "AND i.feed_id IN (SELECT feed_id FROM sources WHERE user_id = $3) "
+            "ORDER BY ts_rank(i.search, q) DESC LIMIT $4",
+            query, since, user_id, limit,
+        )
+
+    async def get_recent_items(self, since: float, limit: int) -> List[Dict]:
+        return await self._fetchall(
+            f"SELECT {_ITEM_COLUMNS} FROM items i WHERE i.fetched_at >= $1 ORDER BY i.fetched_at DESC LIMIT $2",
+            since, limit,
+        )
+
+    async def delete_old_items(self, before: float) -> None:
+        await self._execute("DELETE FROM items WHERE fetched_at < $1", before)
+
+    # Telegram
+    async def get_telegram_watermark(self, channel: str) -> int:
+        value = await self._get_pool().fetchval(
+            "SELECT last_message_id FROM telegram_watermarks WHERE channel = $1", channel
+        )
+        return value or 0
+
+    async def set_telegram_watermark(self, channel: str, last_message_id: int) -> None:
+        await self._execute(
+            "INSERT INTO telegram_watermarks(channel, last_message_id, updated_at) VALUES ($1, $2, now()) "
+            "ON CONFLICT (channel) DO UPDATE SET "
+            "last_message_id = GREATEST(telegram_watermarks.last_message_id, excluded.last_message_id), "
+            "updated_at = excluded.updated_at",
+            channel, last_message_id,
+        )
+
+    async def get_telegram_entity(self, handle: str, resolved_after: float) -> Optional[Dict]:
+        return await self._fetchone(
+            "SELECT * FROM telegram_entities WHERE handle = $1 AND resolved_at >= $2",
+            handle, resolved_after,
+        )
+
+    async def save_telegram_entity(
+            self,
+            handle: str,
+            kind: str,
+            peer_id: int,
+            access_hash: Optional[int],
+            title: Optional[str],
+            username: Optional[str],
+            resolved_at: float,
+    ) -> None:
+        await self._execute(
+            "INSERT INTO telegram_entities(handle, kind, peer_id, access_hash, title, username, resolved_at) "
+            "VALUES ($1, $2, $3, $4, $5, $6, $7) "
+            "ON CONFLICT (handle) DO UPDATE SET kind = excluded.kind, peer_id = excluded.peer_id, "
+            "access_hash = excluded.access_hash, title = excluded.title, username = excluded.username, "
+            "resolved_at = excluded.resolved_at",
+            handle, kind, peer_id, access_hash, title, username, resolved_at,
+        )
+
+    async def delete_telegram_entity(self, handle: str) -> None:
+        await self._execute("DELETE FROM telegram_entities WHERE handle = $1", handle)
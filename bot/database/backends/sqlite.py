@@ -0,0 +1,450 @@
+import json
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from bot.database.models import (
+    CONNECTION_PRAGMAS,
+    MIGRATIONS,
+    ITEMS_FTS_TABLE_SQL,
+    ITEMS_FTS_TRIGGERS_SQL,
+)
+from bot.database.pool import ConnectionPool
+from bot.utils.urls import normalize_source_url
+from .base import StorageBackend, interest_terms
+
+# UPDATE ... RETURNING (аренда слотов рассылки) появился в SQLite 3.35
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+
+async def apply_pragmas(db: aiosqlite.Connection) -> None:
+    for pragma in CONNECTION_PRAGMAS:
+        await db.execute(pragma)
+
+
+async def _upgrade_base_schema(db: aiosqlite.Connection) -> None:
+    """Доводит базы, созданные до появления версий схемы, до версии 1"""
+    await _add_column_if_missing(db, "feeds", "poll_interval", "INTEGER NOT NULL DEFAULT 900")
+    await _add_column_if_missing(db, "feeds", "last_polled_at", "REAL")
+    await _add_column_if_missing(db, "feeds", "next_poll_at", "REAL")
+    await _create_items_fts(db)
+    await _link_sources_to_feeds(db)
+
+
+async def _add_column_if_missing(db: aiosqlite.Connection, table: str, column: str, ddl: str) -> None:
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        columns = [row[1] for row in await cursor.fetchall()]
+    if column not in columns:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+async def _create_items_fts(db: aiosqlite.Connection) -> None:
+    async with db.execute("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'") as cursor:
+        exists = await cursor.fetchone() is not None
+    await db.execute(ITEMS_FTS_TABLE_SQL)
+    for trigger_sql in ITEMS_FTS_TRIGGERS_SQL:
+        await db.execute(trigger_sql)
+    if not exists:
+        # Индексируем записи, сохраненные до появления индекса
+        await db.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+
+
+async def _link_sources_to_feeds(db: aiosqlite.Connection) -> None:
+    """Переносит подписки из старой схемы sources в общий реестр feeds"""
+    await _add_column_if_missing(db, "sources", "feed_id", "INTEGER REFERENCES feeds(feed_id)")
+
+    async with db.execute("SELECT source_id, type, url FROM sources WHERE feed_id IS NULL") as cursor:
+        rows = await cursor.fetchall()
+    for source_id, type_, url in rows:
+        url = normalize_source_url(type_, url)
+        feed_id = await _ensure_feed(db, type_, url)
+        await db.execute("UPDATE sources SET url = ?, feed_id = ? WHERE source_id = ?", (url, feed_id, source_id))
+
+
+async def _ensure_feed(db: aiosqlite.Connection, type_: str, url: str) -> int:
+    await db.execute("INSERT OR IGNORE INTO feeds(type, url) VALUES (?, ?)", (type_, url))
+    async with db.execute("SELECT feed_id FROM feeds WHERE type = ? AND url = ?", (type_, url)) as cursor:
+        row = await cursor.fetchone()
+        return row[0]
+
+
+# Шаги миграций, которые не выражаются одним SQL
+_MIGRATION_HOOKS = {
+    1: _upgrade_base_schema,
+}
+
+
+async def migrate(db_path: str) -> None:
+    """Включает WAL и применяет к базе недостающие миграции схемы"""
+    async with aiosqlite.connect(db_path) as db:
+        await db.execute("PRAGMA journal_mode = WAL")
+        await apply_pragmas(db)
+        async with db.execute("PRAGMA user_version") as cursor:
+            version = (await cursor.fetchone())[0]
+        for number, statements in enumerate(MIGRATIONS, start=1):
+            if number <= version:
+                continue
+            await db.execute("BEGIN")
+            for sql in statements:
+                await db.execute(sql)
+            hook = _MIGRATION_HOOKS.get(number)
+            if hook is not None:
+                await hook(db)
+            await db.execute(f"PRAGMA user_version = {number}")
+            await db.commit()
+
+
+def build_match_query(interests: List[str]) -> str:
+    """Запрос FTS5 MATCH: любое слово любого интереса"""
+    return " OR ".join(f'"{word}"*' if prefix else f'"{word}"' for word, prefix in interest_terms(interests))
+
+
+_UPSERT_ITEM_SQL = (
+    "INSERT INTO items(feed_id, type, link, title, summary, published, source, fetched_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(feed_id, link) DO UPDATE SET title = excluded.title, summary = excluded.summary, "
+    "published = excluded.published, source = excluded.source "
+    # Неизмененные записи не переписываем, чтобы не трогать полнотекстовый индекс
+    "WHERE items.title IS NOT excluded.title OR items.summary IS NOT excluded.summary "
+    "OR items.published IS NOT excluded.published OR items.source IS NOT excluded.source"
+)
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Хранилище в файле SQLite для одного процесса
+
+    Args:
+        path: Путь к файлу базы
+        pool_size: Количество долгоживущих соединений; до open() запросы
+            идут через разовые соединения
+    """
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool: Optional[ConnectionPool] = None
+
+    async def open(self) -> None:
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(
+                f"SQLite {sqlite3.sqlite_version} is too old, "
+                f"{'.'.join(map(str, MIN_SQLITE_VERSION))} or newer is required"
+            )
+        await migrate(self.path)
+        pool = ConnectionPool(self.path, size=self.pool_size)
+        await pool.open()
+        self._pool = pool
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    @asynccontextmanager
+    async def _connect(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Соединение из пула, а до его открытия — разовое"""
+        if self._pool is not None:
+            async with self._pool.acquire() as db:
+                yield db
+            return
+        async with aiosqlite.connect(self.path) as db:
+            db.row_factory = aiosqlite.Row
+            await apply_pragmas(db)
+            yield db
+
+    async def _fetchall(self, sql: str, params: tuple = ()) -> List[Dict]:
+        async with self._connect() as db:
+            async with db.execute(sql, params) as cursor:
+                rows = await cursor.fetchall()
+                return [dict(r) for r in rows]
+
+    async def _fetchone(self, sql: str, params: tuple = ()) -> Optional[Dict]:
+        async with self._connect() as db:
+            async with db.execute(sql, params) as cursor:
+                row = await cursor.fetchone()
+                return dict(row) if row else None
+
+    async def _execute(self, sql: str, params: tuple = ()) -> None:
+        async with self._connect() as db:
+            await db.execute(sql, params)
+            await db.commit()
+
+    # Users
+    async def add_user(self, user_id: int, chat_id: int) -> None:
+        await self._execute("INSERT OR IGNORE INTO users(user_id, chat_id) VALUES (?, ?)", (user_id, chat_id))
+
+    async def get_user(self, user_id: int) -> Optional[Dict]:
+        return await self._fetchone("SELECT * FROM users WHERE user_id = ?", (user_id,))
+
+    async def get_schedule_slots(self) -> List[str]:
+        rows = await self._fetchall("SELECT DISTINCT schedule FROM users WHERE schedule IS NOT NULL")
+        return [r["schedule"] for r in rows]
+
+    async def get_slot_users(self, slot: str, after_user_id: int, limit: int) -> List[Dict]:
+        return await self._fetchall(
+            "SELECT user_id, chat_id FROM users WHERE schedule = ? AND user_id > ? ORDER BY user_id LIMIT ?",
+            (slot, after_user_id, limit),
+        )
+
+    async def update_schedule(self, user_id: int, schedule: Optional[str]) -> None:
+        await self._execute("UPDATE users SET schedule = ? WHERE user_id = ?", (schedule, user_id))
+
+    # Digest slots
+    async def save_digest_slot(self, slot: str, next_run_at: float) -> None:
+        await self._execute(
+            "INSERT OR IGNORE INTO digest_slots(slot, next_run_at) VALUES (?, ?)", (slot, next_run_at)
+        )
+
+    async def claim_digest_slots(self, owner: str, now: float, lease_until: float, limit: int) -> List[Dict]:
+        # Одна инструкция UPDATE выполняется под блокировкой записи всей базы,
+        # поэтому два процесса не получат один и тот же слот
+        async with self._connect() as db:
+            async with db.execute(
+                "UPDATE digest_slots SET lease_owner = ?, lease_until = ? WHERE slot IN ("
+                "SELECT slot FROM digest_slots WHERE next_run_at <= ? "
+                "AND (lease_until IS NULL OR lease_until < ?) ORDER BY next_run_at LIMIT ?"
+                ") RETURNING slot, next_run_at",
+                (owner, lease_until, now, now, limit),
+            ) as cursor:
+                rows = [dict(r) for r in await cursor.fetchall()]
+            await db.commit()
+        return rows
+
+    async def renew_slot_lease(self, slot: str, owner: str, lease_until: float) -> bool:
+        async with self._connect() as db:
+            cursor = await db.execute(
+                "UPDATE digest_slots SET lease_until = ? WHERE slot = ? AND lease_owner = ?",
+                (lease_until, slot, owner),
+            )
+            await db.commit()
+            return cursor.rowcount > 0
+
+    async def complete_digest_slot(self, slot: str, owner: str, next_run_at: float) -> None:
+        async with self._connect() as db:
+            cursor = await db.execute(
+                "UPDATE digest_slots SET next_run_at = ?, lease_owner = NULL, lease_until = NULL "
+                "WHERE slot = ? AND lease_owner = ?",
+                (next_run_at, slot, owner),
+            )
+            # Потерявший аренду процесс не трогает журнал нового владельца
+            if cursor.rowcount > 0:
+                await db.execute("DELETE FROM digest_deliveries WHERE slot = ?", (slot,))
+            await db.commit()
+
+    async def release_digest_slot(self, slot: str, owner: str) -> None:
+        await self._execute(
+            "UPDATE digest_slots SET lease_owner = NULL, lease_until = NULL WHERE slot = ? AND lease_owner = ?",
+            (slot, owner),
+        )
+
+    async def delete_digest_slot(self, slot: str, owner: str) -> bool:
+        async with self._connect() as db:
+            cursor = await db.execute(
+                "DELETE FROM digest_slots WHERE slot = ? AND lease_owner = ? "
+                "AND NOT EXISTS (SELECT 1 FROM users WHERE schedule = ?)",
+                (slot, owner, slot),
+            )
+            deleted = cursor.rowcount > 0
+            if deleted:
+                await db.execute("DELETE FROM digest_deliveries WHERE slot = ?", (slot,))
+            await db.commit()
+            return deleted
+
+    async def get_delivered_users(self, slot: str, run_at: float, user_ids: List[int]) -> List[int]:
+        if not user_ids:
+            return []
+        placeholders = ",".join("?" * len(user_ids))
+        rows = await self._fetchall(
+            f"SELECT user_id FROM digest_deliveries WHERE slot = ? AND run_at = ? AND user_id IN ({placeholders})",
+            (slot, run_at, *user_ids),
+        )
+        return [r["user_id"] for r in rows]
+
+    async def mark_delivered(self, slot: str, run_at: float, user_ids: List[int]) -> None:
+        async with self._connect() as db:
+            await db.executemany(
+                "INSERT OR IGNORE INTO digest_deliveries(slot, run_at, user_id) VALUES (?, ?, ?)",
+                [(slot, run_at, user_id) for user_id in user_ids],
+            )
+            await db.commit()
+
+    # Sources
+    async def add_source(self, user_id: int, type_: str, url: str) -> None:
+        async with self._connect() as db:
+            feed_id = await _ensure_feed(db, type_, url)
+            # Повторная подписка на тот же источник ничего не меняет
+            await db.execute(
+                "INSERT INTO sources(user_id, type, url, feed_id) "
+                "SELECT ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM sources WHERE user_id = ? AND feed_id = ?)",
+                (user_id, type_, url, feed_id, user_id, feed_id),
+            )
+            await db.commit()
+
+    async def get_user_sources(self, user_id: int) -> List[Dict]:
+        return await self._fetchall(
+            "SELECT s.*, f.last_polled_at, f.poll_interval FROM sources s "
+            "LEFT JOIN feeds f ON f.feed_id = s.feed_id "
+            "WHERE s.user_id = ? ORDER BY s.added_at DESC",
+            (user_id,),
+        )
+
+    async def delete_source(self, source_id: int, user_id: int) -> None:
+        await self._execute("DELETE FROM sources WHERE source_id = ? AND user_id = ?", (source_id, user_id))
+
+    # Interests
+    async def add_interest(self, user_id: int, interest_text: str) -> None:
+        await self._execute("INSERT INTO interests(user_id, interest_text) VALUES (?, ?)", (user_id, interest_text))
+
+    async def get_user_interests(self, user_id: int) -> List[Dict]:
+        return await self._fetchall("SELECT * FROM interests WHERE user_id = ? ORDER BY added_at DESC", (user_id,))
+
+    async def delete_interest(self, interest_id: int, user_id: int) -> None:
+        await self._execute("DELETE FROM interests WHERE interest_id = ? AND user_id = ?", (interest_id, user_id))
+
+    # HTTP cache
+    async def get_http_cache(self, url: str) -> Optional[Dict]:
+        cached = await self._fetchone("SELECT * FROM http_cache WHERE url = ?", (url,))
+        if cached:
+            cached["items"] = json.loads(cached["items"])
+        return cached
+
+    async def save_http_cache(
+            self,
+            url: str,
+            etag: Optional[str],
+            last_modified: Optional[str],
+            items: List[Dict],
+    ) -> None:
+        await self._execute(
+            "INSERT INTO http_cache(url, etag, last_modified, items, fetched_at) "
+            "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP) "
+            "ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified, "
+            "items = excluded.items, fetched_at = excluded.fetched_at",
+            (url, etag, last_modified, json.dumps(items, ensure_ascii=False)),
+        )
+
+    async def delete_http_cache(self, url: str) -> None:
+        await self._execute("DELETE FROM http_cache WHERE url = ?", (url,))
+
+    # Feeds
+    async def get_due_feeds(self, now: float, limit: int) -> List[Dict]:
+        return await self._fetchall(
+            "SELECT * FROM feeds f "
+            "WHERE (f.next_poll_at IS NULL OR f.next_poll_at <= ?) "
+            "AND EXISTS (SELECT 1 FROM sources s WHERE s.feed_id = f.feed_id) "
+            "ORDER BY f.next_poll_at IS NOT NULL, f.next_poll_at LIMIT ?",
+            (now, limit),
+        )
+
+    async def update_feed_poll(self, feed_id: int, polled_at: float, poll_interval: int) -> List[int]:
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT s.user_id FROM sources s JOIN feeds f ON f.feed_id = s.feed_id "
+                "WHERE f.feed_id = ? AND f.last_polled_at IS NULL",
+                (feed_id,),
+            ) as cursor:
+                subscribers = [row[0] for row in await cursor.fetchall()]
+            await db.execute(
+                "UPDATE feeds SET last_polled_at = ?, next_poll_at = ?, poll_interval = ? WHERE feed_id = ?",
+                (polled_at, polled_at + poll_interval, poll_interval, feed_id),
+            )
+            await db.commit()
+        return subscribers
+
+    # Items
+    async def save_items_batch(self, batches: List[Tuple[int, List[Dict], float]]) -> List[int]:
+        new_counts = []
+        async with self._connect() as db:
+            for feed_id, items, fetched_at in batches:
+                if not items:
+                    new_counts.append(0)
+                    continue
+                async with db.execute("SELECT COUNT(*) FROM items WHERE feed_id = ?", (feed_id,)) as cursor:
+                    before = (await cursor.fetchone())[0]
+                await db.executemany(
+                    _UPSERT_ITEM_SQL,
+                    [
+                        (feed_id, it["type"], it["link"], it["title"], it["summary"], it["published"], it["source"],
+                         fetched_at)
+                        for it in items
+                    ],
+                )
+                async with db.execute("SELECT COUNT(*) FROM items WHERE feed_id = ?", (feed_id,)) as cursor:
+                    after = (await cursor.fetchone())[0]
+                new_counts.append(after - before)
+            await db.commit()
+        return new_counts
+
+    async def get_user_items(self, user_id: int, since: float, limit: int) -> List[Dict]:
+        return await self._fetchall(
+            "SELECT i.* FROM items i JOIN sources s ON s.feed_id = i.feed_id "
+            "WHERE s.user_id = ? AND i.fetched_at >= ? ORDER BY i.fetched_at DESC, i.item_id DESC LIMIT ?",
+            (user_id, since, limit),
+        )
+
+    async def search_user_items(self, user_id: int, interests: List[str], since: float, limit: int) -> List[Dict]:
+        match = build_match_query(interests)
+        if not match:
+            return []
+        return await self._fetchall(
+            "SELECT i.* FROM items_fts "
+            "JOIN items i ON i.item_id = items_fts.rowid "
+            "WHERE items_fts MATCH ? AND i.fetched_at >= ? "
+            "AND i.feed_id IN (SELECT feed_id FROM sources WHERE user_id = ?) "
+            "ORDER BY bm25(items_fts) LIMIT ?",
+            (match, since, user_id, limit),
+        )
+
+    async def get_recent_items(self, since: float, limit: int) -> List[Dict]:
+        return await self._fetchall(
+            "SELECT * FROM items WHERE fetched_at >= ? ORDER BY fetched_at DESC LIMIT ?",
+            (since, limit),
+        )
+
+    async def delete_old_items(self, before: float) -> None:
+        await self._execute("DELETE FROM items WHERE fetched_at < ?", (before,))
+
+    # Telegram
+    async def get_telegram_watermark(self, channel: str) -> int:
+        row = await self._fetchone("SELECT last_message_id FROM telegram_watermarks WHERE channel = ?", (channel,))
+        return row["last_message_id"] if row else 0
+
+    async def set_telegram_watermark(self, channel: str, last_message_id: int) -> None:
+        await self._execute(
+            "INSERT INTO telegram_watermarks(channel, last_message_id, updated_at) "
+            "VALUES (?, ?, CURRENT_TIMESTAMP) "
+            "ON CONFLICT(channel) DO UPDATE SET "
+            "last_message_id = MAX(last_message_id, excluded.last_message_id), updated_at = excluded.updated_at",
+            (channel, last_message_id),
+        )
+
+    async def get_telegram_entity(self, handle: str, resolved_after: float) -> Optional[Dict]:
+        return await self._fetchone(
+            "SELECT * FROM telegram_entities WHERE handle = ? AND resolved_at >= ?",
+            (handle, resolved_after),
+        )
+
+    async def save_telegram_entity(
+            self,
+            handle: str,
+            kind: str,
+            peer_id: int,
+            access_hash: Optional[int],
+            title: Optional[str],
+            username: Optional[str],
+            resolved_at: float,
+    ) -> None:
+        await self._execute(
+            "INSERT INTO telegram_entities(handle, kind, peer_id, access_hash, title, username, resolved_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(handle) DO UPDATE SET kind = excluded.kind, peer_id = excluded.peer_id, "
+            "access_hash = excluded.access_hash, title = excluded.title, username = excluded.username, "
+            "resolved_at = excluded.resolved_at",
+            (handle, kind, peer_id, access_hash, title, username, resolved_at),
+        )
+
+    async def delete_telegram_entity(self, handle: str) -> None:
+        await self._execute("DELETE FROM telegram_entities WHERE handle = ?", (handle,))
@@ -1,93 +1,255 @@
-import aiosqlite
-from typing import List, Dict, Optional, Tuple
+import time
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 
-from .models import USERS_TABLE_SQL, SOURCES_TABLE_SQL, INTERESTS_TABLE_SQL
+from .backends import StorageBackend, SQLiteBackend
+from bot.utils.cache import ReadThroughCache
+from bot.utils.urls import normalize_source_url
 
-# Глобальная переменная для пути к БД
-DB_PATH = "bot_database.db"
+# Текущее хранилище; создается в main по конфигурации
+_backend: Optional[StorageBackend] = None
 
+# Профили, источники и интересы читаются много чаще, чем меняются;
+# ключи ("user" | "sources" | "interests", user_id). Изменения, сделанные
+# другими процессами бота, видны не позже чем через ttl
+_profile_cache = ReadThroughCache(10000, ttl=30)
 
-async def init_db(db_path: str) -> None:
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute("PRAGMA foreign_keys = ON")
-        await db.execute(USERS_TABLE_SQL)
-        await db.execute(SOURCES_TABLE_SQL)
-        await db.execute(INTERESTS_TABLE_SQL)
-        await db.commit()
+
+def get_backend() -> StorageBackend:
+    """Текущее хранилище; без init_storage — SQLite по умолчанию на разовых соединениях"""
+    global _backend
+    if _backend is None:
+        _backend = SQLiteBackend("bot_database.db")
+    return _backend
+
+
+async def init_storage(backend: StorageBackend) -> StorageBackend:
+    """Применяет миграции, открывает соединения и делает хранилище текущим"""
+    global _backend
+    await backend.open()
+    _backend = backend
+    _profile_cache.clear()
+    return backend
+
+
+async def close_storage() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+def configure_profile_cache(maxsize: int, ttl: float = 30) -> None:
+    global _profile_cache
+    _profile_cache = ReadThroughCache(maxsize, ttl)
+
+
+def get_profile_cache_stats() -> Dict:
+    return _profile_cache.stats()
 
 
 # Users
 async def add_user(user_id: int, chat_id: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT OR IGNORE INTO users(user_id, chat_id) VALUES (?, ?)",
-            (user_id, chat_id),
-        )
-        await db.commit()
+    await get_backend().add_user(user_id, chat_id)
+    _profile_cache.invalidate(("user", user_id))
 
 
 async def get_user(user_id: int) -> Optional[Tuple]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)) as cursor:
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+    user = await _profile_cache.get_or_load(("user", user_id), lambda: get_backend().get_user(user_id))
+    return dict(user) if user else None
+
+
+async def get_schedule_slots() -> List[str]:
+    """Различные времена рассылки, на которые подписан хотя бы один пользователь"""
+    return await get_backend().get_schedule_slots()
+
+
+async def iter_slot_users(slot: str, page_size: int = 500) -> AsyncIterator[List[Dict]]:
+    """Пользователи слота рассылки страницами по user_id, без загрузки всех сразу"""
+    after = 0
+    while True:
+        page = await get_backend().get_slot_users(slot, after, page_size)
+        if not page:
+            return
+        yield page
+        after = page[-1]["user_id"]
 
 
 async def update_schedule(user_id: int, schedule: Optional[str]) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("UPDATE users SET schedule = ? WHERE user_id = ?", (schedule, user_id))
-        await db.commit()
+    await get_backend().update_schedule(user_id, schedule)
+    _profile_cache.invalidate(("user", user_id))
+
+
+# Digest slots
+async def save_digest_slot(slot: str, next_run_at: float) -> None:
+    await get_backend().save_digest_slot(slot, next_run_at)
+
+
+async def claim_digest_slots(owner: str, lease_ttl: float, limit: int) -> List[Dict]:
+    """Берет в аренду на lease_ttl секунд слоты рассылки, которые пора запускать"""
+    now = time.time()
+    return await get_backend().claim_digest_slots(owner, now, now + lease_ttl, limit)
+
+
+async def renew_slot_lease(slot: str, owner: str, lease_ttl: float) -> bool:
+    return await get_backend().renew_slot_lease(slot, owner, time.time() + lease_ttl)
+
+
+async def complete_digest_slot(slot: str, owner: str, next_run_at: float) -> None:
+    await get_backend().complete_digest_slot(slot, owner, next_run_at)
+
+
+async def release_digest_slot(slot: str, owner: str) -> None:
+    await get_backend().release_digest_slot(slot, owner)
+
+
+async def delete_digest_slot(slot: str, owner: str) -> bool:
+    return await get_backend().delete_digest_slot(slot, owner)
+
+
+async def get_delivered_users(slot: str, run_at: float, user_ids: List[int]) -> List[int]:
+    """Пользователи, которым дайджест этого запуска слота уже отправлен"""
+    return await get_backend().get_delivered_users(slot, run_at, user_ids)
+
+
+async def mark_delivered(slot: str, run_at: float, user_ids: List[int]) -> None:
+    await get_backend().mark_delivered(slot, run_at, user_ids)
 
 
 # Sources
 async def add_source(user_id: int, type_: str, url: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO sources(user_id, type, url) VALUES (?, ?, ?)",
-            (user_id, type_, url),
-        )
-        await db.commit()
+    await get_backend().add_source(user_id, type_, normalize_source_url(type_, url))
+    _profile_cache.invalidate(("sources", user_id))
 
 
 async def get_user_sources(user_id: int) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM sources WHERE user_id = ? ORDER BY added_at DESC", (user_id,)) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(r) for r in rows]
+    sources = await _profile_cache.get_or_load(("sources", user_id), lambda: get_backend().get_user_sources(user_id))
+    # Копии, чтобы вызывающий код не испортил закэшированные записи
+    return [dict(r) for r in sources]
 
 
 async def delete_source(source_id: int, user_id: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM sources WHERE source_id = ? AND user_id = ?", (source_id, user_id))
-        await db.commit()
+    await get_backend().delete_source(source_id, user_id)
+    _profile_cache.invalidate(("sources", user_id))
 
 
 # Interests
 async def add_interest(user_id: int, interest_text: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO interests(user_id, interest_text) VALUES (?, ?)",
-            (user_id, interest_text),
-        )
-        await db.commit()
+    await get_backend().add_interest(user_id, interest_text)
+    _profile_cache.invalidate(("interests", user_id))
 
 
 async def get_user_interests(user_id: int) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM interests WHERE user_id = ? ORDER BY added_at DESC", (user_id,)) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(r) for r in rows]
+    interests = await _profile_cache.get_or_load(
+        ("interests", user_id), lambda: get_backend().get_user_interests(user_id)
+    )
+    return [dict(r) for r in interests]
 
 
 async def delete_interest(interest_id: int, user_id: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "DELETE FROM interests WHERE interest_id = ? AND user_id = ?",
-            (interest_id, user_id),
-        )
-        await db.commit()
+    await get_backend().delete_interest(interest_id, user_id)
+    _profile_cache.invalidate(("interests", user_id))
+
+
+# HTTP cache
+async def get_http_cache(url: str) -> Optional[Dict]:
+    return await get_backend().get_http_cache(url)
+
+
+async def save_http_cache(url: str, etag: Optional[str], last_modified: Optional[str], items: List[Dict]) -> None:
+    await get_backend().save_http_cache(url, etag, last_modified, items)
+
+
+async def delete_http_cache(url: str) -> None:
+    await get_backend().delete_http_cache(url)
+
+
+# Feeds
+async def get_due_feeds(now: Optional[float] = None, limit: int = 100) -> List[Dict]:
+    """Источники с подписчиками, которые пора опросить"""
+    now = now if now is not None else time.time()
+    return await get_backend().get_due_feeds(now, limit)
+
+
+async def update_feed_poll(feed_id: int, polled_at: float, poll_interval: int) -> None:
+    subscribers = await get_backend().update_feed_poll(feed_id, polled_at, poll_interval)
+    # Закэшированные списки источников хранят last_polled_at; сбрасываем их,
+    # только когда источник опрашивается впервые — дайджест по нему решает,
+    # грузить ли источник сразу
+    for user_id in subscribers:
+        _profile_cache.invalidate(("sources", user_id))
+
+
+# Items
+async def save_items(feed_id: int, items: List[Dict], fetched_at: Optional[float] = None) -> int:
+    """
+    Сохраняет нормализованные записи источника, обновляя уже известные по ссылке
+
+    Returns:
+        Количество новых записей
+    """
+    fetched_at = fetched_at if fetched_at is not None else time.time()
+    return (await save_items_batch([(feed_id, items, fetched_at)]))[0]
+
+
+async def save_items_batch(batches: List[Tuple[int, List[Dict], float]]) -> List[int]:
+    """
+    Сохраняет записи нескольких источников одной транзакцией
+
+    Args:
+        batches: Список (feed_id, записи, время загрузки)
+
+    Returns:
+        Количество новых записей для каждого элемента batches
+    """
+    return await get_backend().save_items_batch(batches)
+
+
+async def get_user_items(user_id: int, since: float, limit: int = 500) -> List[Dict]:
+    """Записи из источников пользователя, загруженные не раньше since"""
+    return await get_backend().get_user_items(user_id, since, limit)
+
+
+async def search_user_items(user_id: int, interests: List[str], since: float, limit: int = 300) -> List[Dict]:
+    """
+    Кандидаты для дайджеста из полнотекстового индекса: записи источников
+    пользователя не старше since, содержащие слова его интересов, лучшие по релевантности
+    """
+    return await get_backend().search_user_items(user_id, interests, since, limit)
+
+
+async def get_recent_items(since: float, limit: int = 20000) -> List[Dict]:
+    return await get_backend().get_recent_items(since, limit)
+
+
+async def delete_old_items(before: float) -> None:
+    await get_backend().delete_old_items(before)
+
+
+# Telegram watermarks
+async def get_telegram_watermark(channel: str) -> int:
+    return await get_backend().get_telegram_watermark(channel)
+
+
+async def set_telegram_watermark(channel: str, last_message_id: int) -> None:
+    await get_backend().set_telegram_watermark(channel, last_message_id)
+
+
+# Telegram entities
+async def get_telegram_entity(handle: str, max_age: float) -> Optional[Dict]:
+    """Закэшированный peer канала, если он разрешался не раньше max_age секунд назад"""
+    return await get_backend().get_telegram_entity(handle, time.time() - max_age)
+
+
+async def save_telegram_entity(
+        handle: str,
+        kind: str,
+        peer_id: int,
+        access_hash: Optional[int],
+        title: Optional[str],
+        username: Optional[str],
+) -> None:
+    await get_backend().save_telegram_entity(handle, kind, peer_id, access_hash, title, username, time.time())
 
 
+async def delete_telegram_entity(handle: str) -> None:
+    await get_backend().delete_telegram_entity(handle)
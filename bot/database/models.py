@@ -7,12 +7,27 @@ CREATE TABLE IF NOT EXISTS users (
 );
 """
 
+# Общий реестр уникальных источников; sources — подписки пользователей на них
+FEEDS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS feeds (
+    feed_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL CHECK (type IN ('rss','website','telegram')),
+    url TEXT NOT NULL,
+    poll_interval INTEGER NOT NULL DEFAULT 900,
+    last_polled_at REAL,
+    next_poll_at REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (type, url)
+);
+"""
+
 SOURCES_TABLE_SQL = """
 CREATE TABLE IF NOT EXISTS sources (
     source_id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
     type TEXT NOT NULL CHECK (type IN ('rss','website','telegram')),
     url TEXT NOT NULL,
+    feed_id INTEGER REFERENCES feeds(feed_id),
     added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
@@ -29,3 +44,163 @@ CREATE TABLE IF NOT EXISTS interests (
 """
 
 
+
+HTTP_CACHE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    items TEXT NOT NULL DEFAULT '[]',
+    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Время опроса и загрузки хранится в unix-секундах, чтобы сравнивать без разбора дат
+ITEMS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS items (
+    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    feed_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    link TEXT NOT NULL,
+    title TEXT,
+    summary TEXT,
+    published TEXT,
+    source TEXT,
+    fetched_at REAL NOT NULL,
+    UNIQUE (feed_id, link),
+    FOREIGN KEY (feed_id) REFERENCES feeds(feed_id) ON DELETE CASCADE
+);
+"""
+
+ITEMS_FETCHED_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_items_feed_fetched ON items(feed_id, fetched_at);
+"""
+
+# Полнотекстовый индекс по items для отбора кандидатов по словам интересов;
+# содержимое не дублируется, индекс синхронизируется триггерами
+ITEMS_FTS_TABLE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    title,
+    summary,
+    content='items',
+    content_rowid='item_id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+ITEMS_FTS_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, title, summary) VALUES (new.item_id, new.title, new.summary);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, title, summary) VALUES ('delete', old.item_id, old.title, old.summary);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, title, summary) VALUES ('delete', old.item_id, old.title, old.summary);
+        INSERT INTO items_fts(rowid, title, summary) VALUES (new.item_id, new.title, new.summary);
+    END;
+    """,
+]
+
+TELEGRAM_WATERMARKS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS telegram_watermarks (
+    channel TEXT PRIMARY KEY,
+    last_message_id INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+TELEGRAM_ENTITIES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS telegram_entities (
+    handle TEXT PRIMARY KEY,
+    kind TEXT NOT NULL CHECK (kind IN ('channel','chat')),
+    peer_id INTEGER NOT NULL,
+    access_hash INTEGER,
+    title TEXT,
+    username TEXT,
+    resolved_at REAL NOT NULL
+);
+"""
+
+SOURCES_USER_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_sources_user_added ON sources(user_id, added_at);
+"""
+
+SOURCES_FEED_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_sources_feed ON sources(feed_id);
+"""
+
+INTERESTS_USER_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_interests_user_added ON interests(user_id, added_at);
+"""
+
+USERS_SCHEDULE_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_users_schedule ON users(schedule) WHERE schedule IS NOT NULL;
+"""
+
+DIGEST_SLOTS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS digest_slots (
+    slot TEXT PRIMARY KEY,
+    next_run_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_until REAL
+);
+"""
+
+DIGEST_SLOTS_DUE_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_digest_slots_due ON digest_slots(next_run_at);
+"""
+
+DIGEST_DELIVERIES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS digest_deliveries (
+    slot TEXT NOT NULL,
+    run_at REAL NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (slot, run_at, user_id)
+) WITHOUT ROWID;
+"""
+
+# Настройки каждого соединения; journal_mode = WAL хранится в самом файле
+# и включается один раз в init_db
+CONNECTION_PRAGMAS = [
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Миграции схемы по порядку; номер последней примененной хранится в PRAGMA user_version.
+# Новые изменения схемы добавляются в конец списка, уже выпущенные не меняются.
+MIGRATIONS = [
+    # 1: базовая схема
+    [
+        USERS_TABLE_SQL,
+        FEEDS_TABLE_SQL,
+        SOURCES_TABLE_SQL,
+        INTERESTS_TABLE_SQL,
+        HTTP_CACHE_TABLE_SQL,
+        ITEMS_TABLE_SQL,
+        ITEMS_FETCHED_INDEX_SQL,
+        TELEGRAM_WATERMARKS_TABLE_SQL,
+        TELEGRAM_ENTITIES_TABLE_SQL,
+    ],
+    # 2: индексы по пользователю для списков источников и интересов
+    [
+        SOURCES_USER_INDEX_SQL,
+        SOURCES_FEED_INDEX_SQL,
+        INTERESTS_USER_INDEX_SQL,
+        USERS_SCHEDULE_INDEX_SQL,
+    ],
+    # 3: общее для нескольких процессов расписание рассылки и журнал доставки
+    [
+        DIGEST_SLOTS_TABLE_SQL,
+        DIGEST_SLOTS_DUE_INDEX_SQL,
+        DIGEST_DELIVERIES_TABLE_SQL,
+    ],
+]
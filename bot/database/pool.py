@@ -0,0 +1,67 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import aiosqlite
+
+from .models import CONNECTION_PRAGMAS
+
+
+class ConnectionPool:
+    """
+    Небольшой пул долгоживущих соединений SQLite
+
+    Каждое соединение держит свой поток и кэш подготовленных выражений,
+    поэтому запрос не платит за открытие файла и разбор SQL.
+    Соединение выдается в монопольное пользование до конца блока.
+
+    Args:
+        path: Путь к файлу базы
+        size: Количество соединений
+        cached_statements: Размер кэша подготовленных выражений на соединение
+        timeout: Сколько секунд ждать снятия блокировки базы
+    """
+
+    def __init__(self, path: str, size: int = 4, cached_statements: int = 256, timeout: float = 30.0):
+        self.path = path
+        self.size = size
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._connections: List[aiosqlite.Connection] = []
+        self._idle: Optional[asyncio.Queue] = None
+
+    async def open(self) -> None:
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            db = await aiosqlite.connect(
+                self.path,
+                timeout=self.timeout,
+                cached_statements=self.cached_statements,
+            )
+            db.row_factory = aiosqlite.Row
+            for pragma in CONNECTION_PRAGMAS:
+                await db.execute(pragma)
+            self._connections.append(db)
+            self._idle.put_nowait(db)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        if self._idle is None:
+            raise RuntimeError("Connection pool is not open")
+        db = await self._idle.get()
+        try:
+            yield db
+        except BaseException:
+            # Незавершенная транзакция не должна достаться следующему запросу
+            if db.in_transaction:
+                await db.rollback()
+            raise
+        finally:
+            self._idle.put_nowait(db)
+
+    async def close(self) -> None:
+        for db in self._connections:
+            await db.close()
+        self._connections.clear()
+        self._idle = None
+
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .db import save_items, save_items_batch
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _WriteRequest:
+    feed_id: int
+    items: List[Dict]
+    fetched_at: float
+    future: asyncio.Future
+
+
+class ItemWriter:
+    """
+    Единственный писатель записей items: собирает записи разных источников
+    в пачки и сохраняет каждую пачку одной транзакцией
+
+    Пачка сбрасывается, когда набралось max_batch записей или прошло
+    flush_interval секунд с первой записи пачки.
+
+    Args:
+        max_batch: Сколько записей сохранять за одну транзакцию
+        flush_interval: Сколько секунд ждать добора пачки
+    """
+
+    def __init__(self, max_batch: int = 2000, flush_interval: float = 0.2):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Сохраняет все поставленные в очередь записи и останавливает писателя"""
+        if self._task is None:
+            return
+        # Записи, пришедшие во время остановки, сохраняются напрямую, а не за маркером
+        self._stopping = True
+        self._queue.put_nowait(None)
+        try:
+            await self._task
+        finally:
+            self._task = None
+            self._stopping = False
+            self._fail_pending(RuntimeError("Item writer stopped"))
+
+    def _fail_pending(self, error: Exception) -> None:
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if request is not None and not request.future.done():
+                request.future.set_exception(error)
+
+    async def write(self, feed_id: int, items: List[Dict], fetched_at: Optional[float] = None) -> int:
+        """
+        Ставит записи источника в очередь и ждет их сохранения
+
+        Returns:
+            Количество новых записей
+        """
+        if not items:
+            return 0
+        fetched_at = fetched_at if fetched_at is not None else time.time()
+        if self._task is None or self._stopping:
+            return await save_items(feed_id, items, fetched_at)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_WriteRequest(feed_id, items, fetched_at, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            rows = len(first.items)
+            deadline = loop.time() + self.flush_interval
+            while rows < self.max_batch:
+                try:
+                    request = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        request = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                rows += len(request.items)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[_WriteRequest]) -> None:
+        started = time.monotonic()
+        try:
+            new_counts = await save_items_batch([(r.feed_id, r.items, r.fetched_at) for r in batch])
+        except Exception as e:
+            logger.error(f"Item writer: failed to save {len(batch)} feeds: {e}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        for request, new in zip(batch, new_counts):
+            if not request.future.done():
+                request.future.set_result(new)
+        logger.debug(
+            f"Item writer: saved {sum(len(r.items) for r in batch)} items of {len(batch)} feeds "
+            f"in {time.monotonic() - started:.3f}s"
+        )
+
+
+# Глобальный писатель
+_writer: Optional[ItemWriter] = None
+
+
+def get_item_writer() -> ItemWriter:
+    global _writer
+    if _writer is None:
+        _writer = ItemWriter()
+    return _writer
+
+
+async def start_item_writer(max_batch: int = 2000, flush_interval: float = 0.2) -> ItemWriter:
+    global _writer
+    _writer = ItemWriter(max_batch=max_batch, flush_interval=flush_interval)
+    await _writer.start()
+    return _writer
+
+
+async def stop_item_writer() -> None:
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
@@ -0,0 +1 @@
+"""Outbound delivery package."""
@@ -0,0 +1,220 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Set
+
+from aiogram.exceptions import (
+    TelegramEntityTooLarge,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from bot.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Меньше — раньше: ответы пользователю идут впереди плановых дайджестов
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SCHEDULED = 10
+
+_priority: ContextVar[int] = ContextVar("delivery_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def delivery_priority(level: int) -> Iterator[None]:
+    """Приоритет всех отправок внутри блока (и порожденных в нем задач)"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    chat_id: Any = field(compare=False)
+    call: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class OutboundDispatcher:
+    """
+    Очередь исходящих сообщений в Bot API
+
+    Общий темп ограничен token bucket, в каждый чат сообщения идут не чаще
+    интервала для этого чата, задачи с меньшим приоритетом ждут, пока
+    не уйдут более срочные. TelegramRetryAfter откладывает чат на указанное
+    время, сетевые ошибки и ошибки сервера повторяются с паузой.
+
+    Args:
+        rate: Сообщений в секунду на всего бота
+        chat_interval: Минимальный интервал между сообщениями в личный чат
+        group_interval: Минимальный интервал между сообщениями в группу
+        max_in_flight: Сколько запросов может выполняться одновременно
+        max_retries: Сколько раз повторять запрос после сетевой ошибки
+    """
+
+    def __init__(
+            self,
+            rate: float = 25.0,
+            chat_interval: float = 1.0,
+            group_interval: float = 3.0,
+            max_in_flight: int = 50,
+            max_retries: int = 5,
+    ):
+        self.bucket = TokenBucket(rate, rate)
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_retries = max_retries
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._chat_ready: Dict[Any, float] = {}
+        # Отложенные задачи ждут в таймерах цикла, а не в очереди
+        self._deferred: Dict[asyncio.TimerHandle, _Job] = {}
+        self._in_flight: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.retry_after = 0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        for task in list(self._in_flight):
+            task.cancel()
+        await asyncio.gather(self._task, *self._in_flight, return_exceptions=True)
+        self._task = None
+        for handle, job in list(self._deferred.items()):
+            handle.cancel()
+            job.future.cancel()
+        self._deferred.clear()
+        while not self._queue.empty():
+            self._queue.get_nowait().future.cancel()
+
+    async def submit(self, chat_id: Any, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Ставит запрос в очередь с приоритетом текущего контекста и ждет его результата"""
+        if self._task is None:
+            return await call()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Job(_priority.get(), next(self._seq), chat_id, call, future))
+        return await future
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "deferred": len(self._deferred),
+            "in_flight": len(self._in_flight),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "retry_after": self.retry_after,
+        }
+
+    def _interval(self, chat_id: Any) -> float:
+        # Отрицательные id — группы и каналы, у них лимит строже
+        if isinstance(chat_id, int) and chat_id < 0:
+            return self.group_interval
+        return self.chat_interval
+
+    def _defer(self, job: _Job, delay: float) -> None:
+        def requeue() -> None:
+            self._deferred.pop(handle, None)
+            self._queue.put_nowait(job)
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._deferred[handle] = job
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if job.future.done():
+                continue
+            wait = self._chat_ready.get(job.chat_id, 0.0) - time.monotonic()
+            if wait > 0:
+                # Не держим очередь ради одного чата
+                self._defer(job, wait)
+                continue
+            await self._slots.acquire()
+            await self.bucket.acquire()
+            self._chat_ready[job.chat_id] = time.monotonic() + self._interval(job.chat_id)
+            task = asyncio.create_task(self._send(job))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            if len(self._chat_ready) > 10000:
+                now = time.monotonic()
+                self._chat_ready = {k: v for k, v in self._chat_ready.items() if v > now}
+
+    async def _send(self, job: _Job) -> None:
+        try:
+            result = await job.call()
+        except TelegramRetryAfter as e:
+            self.retry_after += 1
+            ready = time.monotonic() + e.retry_after
+            self._chat_ready[job.chat_id] = max(self._chat_ready.get(job.chat_id, 0.0), ready)
+            logger.warning(f"Delivery: retry after {e.retry_after}s for chat {job.chat_id}")
+            self._defer(job, e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            job.attempts += 1
+            if isinstance(e, TelegramEntityTooLarge) or job.attempts > self.max_retries:
+                self._fail(job, e)
+            else:
+                self.retries += 1
+                self._defer(job, min(2 ** job.attempts, 30))
+        except Exception as e:
+            self._fail(job, e)
+        else:
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def _fail(self, job: _Job, error: Exception) -> None:
+        self.failed += 1
+        if not job.future.done():
+            job.future.set_exception(error)
+
+
+# Глобальный диспетчер
+_dispatcher: Optional[OutboundDispatcher] = None
+
+
+def get_outbound_dispatcher() -> OutboundDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = OutboundDispatcher()
+    return _dispatcher
+
+
+async def start_outbound_dispatcher(
+        rate: float = 25.0,
+        chat_interval: float = 1.0,
+        group_interval: float = 3.0,
+) -> OutboundDispatcher:
+    global _dispatcher
+    _dispatcher = OutboundDispatcher(rate=rate, chat_interval=chat_interval, group_interval=group_interval)
+    await _dispatcher.start()
+    return _dispatcher
+
+
+async def stop_outbound_dispatcher() -> None:
+    global _dispatcher
+    if _dispatcher is not None:
+        logger.info(f"Delivery stats: {_dispatcher.stats()}")
+        await _dispatcher.stop()
+        _dispatcher = None
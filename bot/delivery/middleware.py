@@ -0,0 +1,29 @@
+from typing import TYPE_CHECKING
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from .dispatcher import get_outbound_dispatcher
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+
+class DeliveryMiddleware(BaseRequestMiddleware):
+    """
+    Пропускает через очередь доставки все запросы, адресованные чату
+    (отправка и редактирование сообщений); служебные запросы вроде
+    getUpdates и answerCallbackQuery идут напрямую
+    """
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: "Bot",
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+        return await get_outbound_dispatcher().submit(chat_id, lambda: make_request(bot, method))
@@ -1,44 +1,106 @@
-from typing import List, Dict
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from bot.filters.relevance import RelevanceEngine, get_relevance_engine, item_text, fit_and_score
+from bot.utils.executor import run_cpu
 
 
 class ContentFilter:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(
-            max_features=2000,
-            ngram_range=(1, 2),
-            stop_words=None,  # Можно подключить стоп-слова для ru/en при необходимости
-        )
-
-    def filter_by_interests(self, items: List[Dict], interests: List[str], threshold: float = 0.2) -> List[Dict]:
+    def __init__(self, engine: Optional[RelevanceEngine] = None):
+        self.engine = engine if engine is not None else get_relevance_engine()
+
+    async def filter_by_interests(
+            self,
+            items: List[Dict],
+            interests: List[str],
+            threshold: float = 0.2,
+            user_id: Optional[int] = None,
+    ) -> List[Dict]:
         if not items:
             return []
         if not interests:
             # Если интересов нет — вернем top-N без фильтрации
             return items[:20]
 
-        texts = [f"{it.get('title','')} {it.get('summary','')}".strip() for it in items]
-        # Совмещаем интересы в один запрос для получения единого вектора
-        interest_query = "; ".join(interests)
+        # Каждый интерес — отдельный вектор; запись оценивается по лучшему из них
+        if self.engine.fitted:
+            # Только transform: словарь и IDF уже посчитаны по хранилищу
+            best, best_idx = await self.engine.score(items, interests, user_id)
+        else:
+            # Запасной вариант, пока общая модель еще не обучена
+            scores = await run_cpu(
+                fit_and_score, [item_text(it) for it in items], {0: (list(range(len(items))), list(interests))}
+            )
+            best, best_idx = scores[0]
+
+        return self._select(items, interests, best, best_idx, threshold)
+
+    async def filter_batch(
+            self,
+            items_by_user: Dict[int, List[Dict]],
+            interests_by_user: Dict[int, List[str]],
+            threshold: float = 0.2,
+    ) -> Dict[int, List[Dict]]:
+        """
+        Фильтрация для многих пользователей за один проход по общей матрице записей
 
-        corpus = texts + [interest_query]
-        tfidf = self.vectorizer.fit_transform(corpus)
+        Args:
+            items_by_user: user_id -> записи из его источников
+            interests_by_user: user_id -> его интересы
+            threshold: Минимальный балл релевантности
 
-        news_vectors = tfidf[:-1]
-        interest_vector = tfidf[-1]
+        Returns:
+            user_id -> отфильтрованные записи
+        """
+        # Объединение записей без повторов: общий источник векторизуется один раз
+        union: List[Dict] = []
+        positions: Dict[object, int] = {}
+        users: Dict[int, Tuple[List[int], List[str]]] = {}
+        for user_id, items in items_by_user.items():
+            rows = []
+            for it in items:
+                key = it.get("item_id") or it.get("link")
+                if key not in positions:
+                    positions[key] = len(union)
+                    union.append(it)
+                rows.append(positions[key])
+            users[user_id] = (rows, interests_by_user.get(user_id, []))
 
-        sims = cosine_similarity(news_vectors, interest_vector)
-        # sims: (n_news, 1)
+        result: Dict[int, List[Dict]] = {}
+        scored_users = {uid: u for uid, u in users.items() if u[0] and u[1]}
+        for user_id in users.keys() - scored_users.keys():
+            result[user_id] = await self.filter_by_interests(items_by_user[user_id], users[user_id][1])
+        if not scored_users:
+            return result
+
+        if self.engine.fitted:
+            scores = await self.engine.score_batch(union, scored_users)
+        else:
+            # Одно обучение на всю волну вместо обучения на каждого пользователя
+            scores = await run_cpu(fit_and_score, [item_text(it) for it in union], scored_users)
+
+        for user_id, (rows, interests) in scored_users.items():
+            best, best_idx = scores[user_id]
+            result[user_id] = self._select(items_by_user[user_id], interests, best, best_idx, threshold)
+        return result
+
+    @staticmethod
+    def _select(
+            items: List[Dict],
+            interests: List[str],
+            best: np.ndarray,
+            best_idx: np.ndarray,
+            threshold: float,
+    ) -> List[Dict]:
         scored = []
         for idx, item in enumerate(items):
-            score = float(sims[idx][0])
+            score = float(best[idx])
             if score >= threshold:
                 enriched = dict(item)
                 enriched["relevance_score"] = score
+                enriched["matched_interest"] = interests[int(best_idx[idx])]
                 scored.append(enriched)
 
         scored.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
         return scored[:50]
-
-
@@ -0,0 +1,154 @@
+import re
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from bot.filters.relevance import item_text, content_hash
+from bot.utils.cache import LRUCache
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_TAG_RE = re.compile(r"<[^>]+>")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingles(text: str, size: int) -> np.ndarray:
+    """Хэши словесных шинглов текста без HTML-разметки"""
+    words = _WORD_RE.findall(_TAG_RE.sub(" ", text).lower())
+    if len(words) < size:
+        grams = {" ".join(words)} if words else set()
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class NearDuplicateDetector:
+    """
+    Кластеризация почти одинаковых записей через MinHash и LSH по полосам
+
+    Сравниваются только записи, попавшие в одну корзину хотя бы по одной полосе,
+    поэтому время почти линейно по числу записей.
+
+    Args:
+        threshold: Минимальная оценка сходства Жаккара для объединения
+        bands: Количество полос LSH
+        rows: Строк сигнатуры в полосе (bands * rows = длина сигнатуры);
+            порог кандидатов LSH около (1 / bands) ** (1 / rows) должен быть
+            ниже threshold: при 32 * 2 это 0.18, и пары со сходством 0.5
+            становятся кандидатами почти всегда
+        shingle_size: Длина шингла в словах
+        cache_size: Сколько сигнатур держать в кэше по хэшу текста
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.5,
+            bands: int = 32,
+            rows: int = 2,
+            shingle_size: int = 2,
+            cache_size: int = 100000,
+            seed: int = 1,
+    ):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        num_perm = bands * rows
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._signatures = LRUCache(cache_size)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        key = content_hash(text)
+        cached = self._signatures.get(key)
+        if cached is not None:
+            return cached
+        shingles = _shingles(text, self.shingle_size)
+        if not len(shingles):
+            return None
+        hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        signature = hashed.min(axis=1)
+        self._signatures.set(key, signature)
+        return signature
+
+    def clusters(self, texts: List[str]) -> List[List[int]]:
+        """
+        Группы индексов почти одинаковых текстов, в порядке первого появления
+
+        Returns:
+            Список кластеров; одиночные записи образуют кластер из одного элемента
+        """
+        signatures = [self.signature(t) for t in texts]
+        parent = list(range(len(texts)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for band in range(self.bands):
+            start = band * self.rows
+            buckets: Dict[bytes, int] = {}
+            for i, sig in enumerate(signatures):
+                if sig is None:
+                    continue
+                key = sig[start:start + self.rows].tobytes()
+                j = buckets.setdefault(key, i)
+                if j == i:
+                    continue
+                ri, rj = find(i), find(j)
+                if ri == rj:
+                    continue
+                # Отсекаем случайные совпадения полосы по оценке сходства всей сигнатуры
+                if np.mean(signatures[i] == signatures[j]) >= self.threshold:
+                    parent[max(ri, rj)] = min(ri, rj)
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(texts)):
+            groups.setdefault(find(i), []).append(i)
+        return list(groups.values())
+
+
+def _quality(item: Dict) -> tuple:
+    # Больше текста и есть дата публикации — полнее материал
+    return len(item.get("summary") or ""), item.get("published") is not None
+
+
+def deduplicate(items: List[Dict], detector: Optional[NearDuplicateDetector] = None) -> List[Dict]:
+    """
+    Оставляет по одной записи на кластер почти одинаковых новостей
+
+    Лучшая запись кластера сохраняется, остальные прикладываются к ней в поле
+    alternates как {"source", "link"}.
+    """
+    if len(items) < 2:
+        return items
+    detector = detector or get_duplicate_detector()
+    result = []
+    for cluster in detector.clusters([item_text(it) for it in items]):
+        if len(cluster) == 1:
+            result.append(items[cluster[0]])
+            continue
+        members = [items[i] for i in cluster]
+        best = max(members, key=_quality)
+        representative = dict(best)
+        representative["alternates"] = [
+            {"source": it.get("source"), "link": it.get("link")}
+            for it in members
+            if it is not best and it.get("link") != best.get("link")
+        ]
+        result.append(representative)
+    return result
+
+
+# Глобальный экземпляр с общим кэшем сигнатур
+_detector: Optional[NearDuplicateDetector] = None
+
+
+def get_duplicate_detector() -> NearDuplicateDetector:
+    global _detector
+    if _detector is None:
+        _detector = NearDuplicateDetector()
+    return _detector
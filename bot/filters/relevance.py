@@ -0,0 +1,442 @@
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from bot.utils.cache import LRUCache
+from bot.utils.executor import get_cpu_executor, run_cpu
+
+logger = logging.getLogger(__name__)
+
+
+def make_vectorizer() -> TfidfVectorizer:
+    return TfidfVectorizer(
+        max_features=2000,
+        ngram_range=(1, 2),
+        stop_words=None,  # Можно подключить стоп-слова для ru/en при необходимости
+    )
+
+
+def make_model_vectorizer(max_features: int = 50000) -> TfidfVectorizer:
+    """
+    Векторизатор общей модели: обучается по всему хранилищу, поэтому словарь
+    шире, а слова, встречающиеся в большинстве записей (служебные и общие),
+    и разовые опечатки отбрасываются, чтобы не занимать место слов интересов
+    """
+    return TfidfVectorizer(
+        max_features=max_features,
+        ngram_range=(1, 2),
+        min_df=2,
+        max_df=0.5,
+    )
+
+
+def item_text(item: Dict) -> str:
+    return f"{item.get('title','')} {item.get('summary','')}".strip()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def score_matrix(item_matrix: sparse.csr_matrix, interest_matrix: sparse.csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Косинусная близость всех записей ко всем интересам одним произведением матриц
+
+    Строки TF-IDF уже нормированы по L2, поэтому скалярное произведение равно косинусу.
+
+    Returns:
+        Лучший балл каждой записи и индекс интереса, давшего этот балл
+    """
+    sims = (item_matrix @ interest_matrix.T).toarray()
+    best_idx = sims.argmax(axis=1)
+    best = sims[np.arange(sims.shape[0]), best_idx]
+    return best, best_idx
+
+
+# Функции ниже выполняются в пуле вычислений (bot.utils.executor): только
+# аргументы и результаты, которые передаются через pickle, без общего состояния
+
+def fit_vectorizer(texts: List[str], max_features: int = 50000) -> Tuple[TfidfVectorizer, sparse.csr_matrix]:
+    """Обучает модель и возвращает ее вместе с векторами корпуса"""
+    vectorizer = make_model_vectorizer(max_features)
+    matrix = vectorizer.fit_transform(texts).tocsr()
+    # Отброшенные по max_features слова нужны только для отладки, а в pickle
+    # занимают больше самой модели
+    vectorizer.stop_words_ = None
+    return vectorizer, matrix
+
+
+def vectorize(vectorizer: TfidfVectorizer, texts: List[str]) -> sparse.csr_matrix:
+    return vectorizer.transform(texts).tocsr()
+
+
+# Модель, уже загруженная в этот процесс пула: (файл модели, векторизатор)
+_worker_model: Optional[Tuple[str, TfidfVectorizer]] = None
+
+
+def vectorize_with_model(model_path: str, texts: List[str]) -> sparse.csr_matrix:
+    """
+    То же, что vectorize, но в процесс передается только путь к модели:
+    каждый процесс пула читает файл один раз на версию модели
+    """
+    global _worker_model
+    if _worker_model is None or _worker_model[0] != model_path:
+        with open(model_path, "rb") as f:
+            _worker_model = (model_path, pickle.load(f))
+    return vectorize(_worker_model[1], texts)
+
+
+def score_columns(
+        item_matrix: sparse.csr_matrix,
+        interest_matrix: sparse.csr_matrix,
+        users: Dict[int, Tuple[List[int], int, int]],
+) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Близость общей матрицы записей к интересам всех пользователей одним произведением
+
+    Args:
+        users: user_id -> (индексы его записей, первый и следующий за последним
+            столбец его интересов в interest_matrix)
+    """
+    sims = (item_matrix @ interest_matrix.T).tocsr()
+    result = {}
+    for user_id, (rows, start, end) in users.items():
+        if not rows:
+            result[user_id] = (np.zeros(0), np.zeros(0, dtype=int))
+            continue
+        block = sims[rows][:, start:end].toarray()
+        best_idx = block.argmax(axis=1)
+        result[user_id] = (block[np.arange(block.shape[0]), best_idx], best_idx)
+    return result
+
+
+def fit_and_score(
+        item_texts: List[str],
+        interests_by_user: Dict[int, Tuple[List[int], List[str]]],
+) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """Разовое обучение по самим записям и интересам, пока общая модель не обучена"""
+    all_interests = [i for _, interests in interests_by_user.values() for i in interests]
+    tfidf = make_vectorizer().fit_transform(item_texts + all_interests).tocsr()
+    users = {}
+    offset = 0
+    for user_id, (rows, interests) in interests_by_user.items():
+        users[user_id] = (rows, offset, offset + len(interests))
+        offset += len(interests)
+    return score_columns(tfidf[:len(item_texts)], tfidf[len(item_texts):], users)
+
+
+class VectorCache:
+    """
+    LRU-кэш TF-IDF векторов записей по хэшу текста с сохранением на диск
+
+    Args:
+        maxsize: Максимальное количество векторов в памяти
+    """
+
+    def __init__(self, maxsize: int = 50000):
+        self.maxsize = maxsize
+        self._cache = LRUCache(maxsize)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key: str) -> Optional[sparse.csr_matrix]:
+        return self._cache.get(key)
+
+    def set(self, key: str, vector: sparse.csr_matrix) -> None:
+        self._cache.set(key, vector)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+    def save(self, path: str) -> None:
+        """Сохраняет векторы одной разреженной матрицей и ключи рядом с ней"""
+        entries = self._cache.items()
+        if not entries:
+            # Не оставляем на диске векторы от предыдущей модели
+            for suffix in (".npz", ".keys.npy"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            return
+        keys = np.array([k for k, _ in entries])
+        matrix = sparse.vstack([v for _, v in entries], format="csr")
+        sparse.save_npz(path + ".npz", matrix)
+        np.save(path + ".keys.npy", keys)
+
+    def load(self, path: str) -> int:
+        if not (os.path.exists(path + ".npz") and os.path.exists(path + ".keys.npy")):
+            return 0
+        matrix = sparse.load_npz(path + ".npz").tocsr()
+        keys = np.load(path + ".keys.npy")
+        for row, key in enumerate(keys):
+            self._cache.set(str(key), matrix[row])
+        return len(keys)
+
+
+def _dump_model(vectorizer: TfidfVectorizer, path: str) -> None:
+    # Запись через временный файл: процессы пула не увидят модель наполовину
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+        pickle.dump(vectorizer, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f.name, path)
+
+
+class RelevanceEngine:
+    """
+    Долгоживущая TF-IDF модель: словарь и IDF обучаются по хранилищу items
+    по расписанию, а ранжирование в дайджесте — только transform
+
+    Args:
+        min_documents: Минимальный размер корпуса для обучения
+        cache_size: Сколько векторов записей держать в памяти
+        max_features: Размер словаря модели
+    """
+
+    def __init__(self, min_documents: int = 50, cache_size: int = 50000, max_features: int = 50000):
+        self.min_documents = min_documents
+        self.max_features = max_features
+        self.vectorizer: Optional[TfidfVectorizer] = None
+        self.version = 0
+        self.fitted_at = 0.0
+        self.vectors = VectorCache(cache_size)
+        # Матрицы интересов по user_id: (версия модели, интересы, матрица)
+        self._interests = LRUCache(10000)
+        # Файл текущей модели для процессов пула вычислений
+        self._model_dir: Optional[str] = None
+        self._model_path: Optional[str] = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.vectorizer is not None
+
+    def fit(self, texts: List[str]) -> bool:
+        """
+        Обучает новую модель и атомарно подменяет текущую
+
+        Returns:
+            True, если корпус был достаточного размера и модель обновлена
+        """
+        texts = list(dict.fromkeys(t for t in texts if t))
+        if len(texts) < self.min_documents:
+            return False
+        started = time.monotonic()
+        vectorizer, matrix = fit_vectorizer(texts, self.max_features)
+        self._install(vectorizer, self._corpus_vectors(texts, matrix), len(texts), started)
+        return True
+
+    async def refit(self, texts: List[str]) -> bool:
+        """То же, что fit, но обучение идет в пуле вычислений"""
+        texts = list(dict.fromkeys(t for t in texts if t))
+        if len(texts) < self.min_documents:
+            return False
+        started = time.monotonic()
+        vectorizer, matrix = await run_cpu(fit_vectorizer, texts, self.max_features)
+        # Раскладка корпуса по кэшу — десятки тысяч срезов матрицы, не в цикле событий;
+        # сама подмена модели — в нем, чтобы ранжирование не увидело ее наполовину
+        vectors = await asyncio.to_thread(self._corpus_vectors, texts, matrix)
+        self._install(vectorizer, vectors, len(texts), started)
+        return True
+
+    def _corpus_vectors(self, texts: List[str], matrix: sparse.csr_matrix) -> VectorCache:
+        # Векторы старой модели несовместимы с новым словарем;
+        # векторы корпуса получаем заодно с обучением
+        vectors = VectorCache(self.vectors.maxsize)
+        for row, text in enumerate(texts):
+            vectors.set(content_hash(text), matrix[row])
+        return vectors
+
+    def _install(self, vectorizer: TfidfVectorizer, vectors: VectorCache, documents: int, started: float) -> None:
+        logger.info(f"Vector cache before refit: {self.vectors.stats()}")
+        self.vectorizer = vectorizer
+        self.vectors = vectors
+        self.version += 1
+        self._drop_model_files()
+        self.fitted_at = time.time()
+        logger.info(
+            f"Relevance model v{self.version} fitted on {documents} documents "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+
+    async def transform_texts(self, texts: List[str]) -> sparse.csr_matrix:
+        if not self.fitted:
+            raise RuntimeError("Relevance model is not fitted")
+        if not get_cpu_executor().use_processes:
+            # Потоки получают модель по ссылке, без pickle
+            return await run_cpu(vectorize, self.vectorizer, texts)
+        # В процессы модель передается через файл, а не pickle на каждый вызов
+        return await run_cpu(vectorize_with_model, await self._model_file(), texts)
+
+    async def _model_file(self) -> str:
+        """Файл с текущей моделью; пишется один раз на версию"""
+        vectorizer, version = self.vectorizer, self.version
+        if self._model_dir is None:
+            self._model_dir = tempfile.mkdtemp(prefix="relevance-")
+            weakref.finalize(self, shutil.rmtree, self._model_dir, True)
+        path = os.path.join(self._model_dir, f"model-{version}.pkl")
+        if self._model_path != path:
+            await asyncio.to_thread(_dump_model, vectorizer, path)
+            if version == self.version:
+                self._model_path = path
+        return path
+
+    async def _consistent(self, compute):
+        """
+        Повторяет compute, если во время его ожиданий модель успела смениться:
+        векторы записей и интересов должны быть от одного словаря
+        """
+        while True:
+            version = self.version
+            result = await compute()
+            if version == self.version:
+                return result
+
+    async def transform_items(self, items: List[Dict]) -> sparse.csr_matrix:
+        """Матрица векторов записей; векторизуются только ранее не встречавшиеся тексты"""
+        texts = [item_text(it) for it in items]
+        keys = [content_hash(t) for t in texts]
+        # Кэш текущей модели: векторы, посчитанные старой моделью, в кэш новой не попадут
+        cache = self.vectors
+        rows: List[Optional[sparse.csr_matrix]] = [cache.get(k) for k in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            vectors = await self.transform_texts([texts[i] for i in missing])
+            for pos, i in enumerate(missing):
+                rows[i] = vectors[pos]
+                cache.set(keys[i], rows[i])
+        return sparse.vstack(rows, format="csr")
+
+    async def interest_matrix(self, interests: List[str], user_id: Optional[int] = None) -> sparse.csr_matrix:
+        """Матрица интересов пользователя; кэшируется до смены модели или списка интересов"""
+        key = tuple(interests)
+        version = self.version
+        if user_id is not None:
+            cached = self._interests.get(user_id)
+            if cached is not None and cached[0] == self.version and cached[1] == key:
+                return cached[2]
+        matrix = await self.transform_texts(list(interests))
+        if user_id is not None:
+            self._interests.set(user_id, (version, key, matrix))
+        return matrix
+
+    def _drop_model_files(self) -> None:
+        # Файл предыдущей версии оставляем: его могут читать уже отправленные в пул вызовы
+        self._model_path = None
+        if self._model_dir is None:
+            return
+        for name in os.listdir(self._model_dir):
+            # Недописанные .tmp заменит сам пишущий вызов
+            if name != f"model-{self.version - 1}.pkl" and not name.endswith(".tmp"):
+                os.remove(os.path.join(self._model_dir, name))
+
+    def invalidate_interests(self, user_id: int) -> None:
+        self._interests.invalidate(user_id)
+
+    async def score(
+            self,
+            items: List[Dict],
+            interests: List[str],
+            user_id: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        async def matrices():
+            return await self.transform_items(items), await self.interest_matrix(interests, user_id)
+
+        item_matrix, interest_matrix = await self._consistent(matrices)
+        return await run_cpu(score_matrix, item_matrix, interest_matrix)
+
+    async def score_batch(
+            self,
+            items: List[Dict],
+            users: Dict[int, Tuple[List[int], List[str]]],
+    ) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Оценивает записи сразу для многих пользователей
+
+        Одна матрица по объединению записей и одна по интересам всех пользователей,
+        перемножаются один раз; каждый пользователь получает свой блок строк и столбцов.
+
+        Args:
+            items: Объединение записей всех пользователей
+            users: user_id -> (индексы его записей в items, его интересы)
+
+        Returns:
+            user_id -> (лучший балл, индекс интереса) для каждой его записи
+        """
+        async def matrices():
+            item_matrix = await self.transform_items(items)
+            blocks = []
+            columns: Dict[int, Tuple[List[int], int, int]] = {}
+            offset = 0
+            for user_id, (rows, interests) in users.items():
+                if not interests:
+                    continue
+                blocks.append(await self.interest_matrix(interests, user_id))
+                columns[user_id] = (rows, offset, offset + len(interests))
+                offset += len(interests)
+            return item_matrix, blocks, columns
+
+        item_matrix, blocks, columns = await self._consistent(matrices)
+        if not blocks:
+            return {}
+        return await run_cpu(score_columns, item_matrix, sparse.vstack(blocks, format="csr"), columns)
+
+    def save(self, directory: str) -> None:
+        """Сохраняет модель и кэш векторов, чтобы после перезапуска не обучаться заново"""
+        if not self.fitted:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "model.pkl"), "wb") as f:
+            pickle.dump({"vectorizer": self.vectorizer, "version": self.version, "fitted_at": self.fitted_at}, f)
+        self.vectors.save(os.path.join(directory, "vectors"))
+
+    def load(self, directory: str) -> bool:
+        model_path = os.path.join(directory, "model.pkl")
+        if not os.path.exists(model_path):
+            return False
+        with open(model_path, "rb") as f:
+            state = pickle.load(f)
+        self.vectorizer = state["vectorizer"]
+        # Модели, сохраненные до выноса вычислений в пул, хранят лишний stop_words_
+        self.vectorizer.stop_words_ = None
+        self.version = state["version"]
+        self.fitted_at = state["fitted_at"]
+        self._drop_model_files()
+        self.vectors.clear()
+        loaded = self.vectors.load(os.path.join(directory, "vectors"))
+        logger.info(f"Relevance model v{self.version} loaded with {loaded} cached vectors")
+        return True
+
+
+# Глобальный экземпляр модели
+_engine: Optional[RelevanceEngine] = None
+
+
+def get_relevance_engine() -> RelevanceEngine:
+    global _engine
+    if _engine is None:
+        _engine = RelevanceEngine()
+    return _engine
+
+
+def init_relevance_engine(cache_size: int, cache_dir: str = "", max_features: int = 50000) -> RelevanceEngine:
+    """Создает глобальную модель и поднимает ее с диска, если есть сохраненная"""
+    global _engine
+    _engine = RelevanceEngine(cache_size=cache_size, max_features=max_features)
+    if cache_dir:
+        try:
+            _engine.load(cache_dir)
+        except Exception as e:
+            logger.warning(f"Cannot load relevance model from {cache_dir}: {e}")
+    return _engine
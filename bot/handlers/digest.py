@@ -1,56 +1,92 @@
-from typing import List, Dict
+import asyncio
+import time
+from typing import List, Dict, Optional
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.types import CallbackQuery
 
-from bot.database.db import get_user_sources, get_user_interests
-from bot.parsers.rss_parser import RSSParser
-from bot.parsers.web_parser import WebParser
-from bot.parsers.telegram_parser import parse_telegram_channel
+from bot.database.db import (
+    get_user_sources, get_user_interests, get_user_items, search_user_items, update_feed_poll,
+)
+from bot.parsers.fetcher import get_fetcher, build_source_handlers
+from bot.scheduler.ingestion import store_results, next_poll_interval
 from bot.config import load_config
 from bot.filters.content_filter import ContentFilter
+from bot.filters.dedup import deduplicate
 from bot.keyboards.inline import get_digest_actions
+from bot.utils.executor import run_cpu
 
 
 digest_router = Router()
 
 
-async def collect_items(user_id: int) -> List[Dict]:
+async def collect_items(user_id: int, interests: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Записи из локального хранилища; еще не опрошенные источники загружаются сразу
+
+    Если переданы интересы, из полнотекстового индекса берутся только
+    записи с их словами, и ранжируется уже этот короткий список.
+    """
     sources = await get_user_sources(user_id)
     if not sources:
         return []
 
-    rss = RSSParser()
-    web = WebParser()
     config = load_config()
-    items: List[Dict] = []
-    
-    for s in sources:
-        url = s["url"]
-        try:
-            if s["type"] == "rss":
-                items.extend(await rss.parse_feed(url))
-            elif s["type"] == "website":
-                items.extend(await web.parse_page(url))
-            elif s["type"] == "telegram":
-                # Парсим Telegram-канал
-                if config.api_id and config.api_hash and config.phone_number:
-                    telegram_items = await parse_telegram_channel(
-                        url,
-                        config.api_id,
-                        config.api_hash,
-                        config.phone_number,
-                        limit=20  # Ограничиваем количество сообщений
-                    )
-                    items.extend(telegram_items)
-                else:
-                    print(f"Telegram API not configured, skipping {url}")
-                    continue
-        except Exception as e:
-            print(f"Error parsing {url}: {e}")
-            continue
-    
-    return items
+    pending = [s for s in sources if s.get("last_polled_at") is None]
+    if pending:
+        fetcher = get_fetcher(config)
+        results = await fetcher.fetch_all(pending, build_source_handlers(config))
+        await store_results(results)
+        polled_at = time.time()
+        for result in results:
+            if result.source.get("feed_id") is None:
+                continue
+            # Неудачная попытка тоже отмечается, с увеличенным интервалом: иначе
+            # сбойный источник грузился бы заново в каждом дайджесте, а дальше
+            # его опрашивает фоновый сбор
+            interval = result.source["poll_interval"]
+            if not result.ok:
+                interval = next_poll_interval(
+                    interval, 0, False, config.poll_min_interval, config.poll_max_interval
+                )
+            await update_feed_poll(result.source["feed_id"], polled_at, interval)
+
+    since = time.time() - config.digest_window_hours * 3600
+    if interests:
+        return await search_user_items(user_id, interests, since, config.digest_candidate_limit)
+    return await get_user_items(user_id, since)
+
+
+async def build_digest(user_id: int) -> List[Dict]:
+    interests = await get_user_interests(user_id)
+    interests_list = [i['interest_text'] for i in interests]
+    # Копии одной новости из разных источников склеиваются до ранжирования
+    items = await run_cpu(deduplicate, await collect_items(user_id, interests_list))
+    return await ContentFilter().filter_by_interests(items, interests_list, user_id=user_id)
+
+
+async def build_digests_batch(user_ids: List[int]) -> Dict[int, List[Dict]]:
+    """Дайджесты для группы пользователей с общим ранжированием"""
+    interests = await asyncio.gather(*(get_user_interests(uid) for uid in user_ids))
+    interests_by_user = {uid: [i['interest_text'] for i in rows] for uid, rows in zip(user_ids, interests)}
+    items = await asyncio.gather(*(collect_items(uid, interests_by_user[uid]) for uid in user_ids))
+    # MinHash — в пуле вычислений, как и остальной разбор и ранжирование
+    items = await asyncio.gather(*(run_cpu(deduplicate, user_items) for user_items in items))
+    return await ContentFilter().filter_batch(dict(zip(user_ids, items)), interests_by_user)
+
+
+def _format_item(it: Dict) -> str:
+    title = it.get("title", "Без заголовка")
+    link = it.get("link")
+    source = it.get("source", "Источник")
+    rel = it.get("relevance_score")
+    rel_s = f"\n_Релевантность: {int(rel*100)}%_" if rel is not None else ""
+    alternates = it.get("alternates") or []
+    alt_s = ""
+    if alternates:
+        refs = ", ".join(f"[{a.get('source') or 'источник'}]({a.get('link')})" for a in alternates[:3])
+        alt_s = f"\n🔁 Также: {refs}"
+    return f"🔹 *{title}*\n📌 Источник: {source}\n🔗 [Читать полностью]({link}){alt_s}{rel_s}\n"
 
 
 def format_digest(items: List[Dict]) -> str:
@@ -58,31 +94,35 @@ def format_digest(items: List[Dict]) -> str:
         return "Нет релевантных материалов по вашим интересам. Попробуйте расширить список источников или тем."
     lines = ["📰 *Ваш дайджест новостей*", ""]
     for it in items[:20]:
-        title = it.get("title", "Без заголовка")
-        link = it.get("link")
-        source = it.get("source", "Источник")
-        rel = it.get("relevance_score")
-        rel_s = f"\n_Релевантность: {int(rel*100)}%_" if rel is not None else ""
-        lines.append(f"🔹 *{title}*\n📌 Источник: {source}\n🔗 [Читать полностью]({link}){rel_s}\n")
+        lines.append(_format_item(it))
+    return "\n".join(lines)
+
+
+def format_digest_by_topics(items: List[Dict]) -> str:
+    """Дайджест, сгруппированный по интересу, который дал записи лучший балл"""
+    if not items:
+        return format_digest(items)
+    groups: Dict[str, List[Dict]] = {}
+    for it in items[:20]:
+        groups.setdefault(it.get("matched_interest") or "Без темы", []).append(it)
+    lines = ["📰 *Ваш дайджест по темам*", ""]
+    for topic, topic_items in groups.items():
+        lines.append(f"*{topic}*")
+        for it in topic_items:
+            lines.append(_format_item(it))
     return "\n".join(lines)
 
 
 @digest_router.message(Command("digest"))
 async def cmd_digest(message: types.Message):
-    items = await collect_items(message.from_user.id)
-    interests = await get_user_interests(message.from_user.id)
-    interests_list = [i['interest_text'] for i in interests]
-    filtered = ContentFilter().filter_by_interests(items, interests_list)
+    filtered = await build_digest(message.from_user.id)
     text = format_digest(filtered)
     await message.answer(text, reply_markup=get_digest_actions(), parse_mode="Markdown")
 
 
 @digest_router.callback_query(F.data == "digest:run")
 async def digest_run(callback: CallbackQuery):
-    items = await collect_items(callback.from_user.id)
-    interests = await get_user_interests(callback.from_user.id)
-    interests_list = [i['interest_text'] for i in interests]
-    filtered = ContentFilter().filter_by_interests(items, interests_list)
+    filtered = await build_digest(callback.from_user.id)
     text = format_digest(filtered)
     await callback.message.edit_text(text, reply_markup=get_digest_actions(), parse_mode="Markdown")
     await callback.answer()
@@ -95,12 +135,12 @@ async def digest_refresh(callback: CallbackQuery):
 
 @digest_router.callback_query(F.data == "digest:group:topics")
 async def digest_group_topics(callback: CallbackQuery):
-    # MVP: просто отправим обычный дайджест (группировку можно добавить позже)
-    await digest_run(callback)
+    filtered = await build_digest(callback.from_user.id)
+    text = format_digest_by_topics(filtered)
+    await callback.message.edit_text(text, reply_markup=get_digest_actions(), parse_mode="Markdown")
+    await callback.answer()
 
 
 @digest_router.callback_query(F.data == "digest:group:sources")
 async def digest_group_sources(callback: CallbackQuery):
     await digest_run(callback)
-
-
@@ -5,6 +5,7 @@ from aiogram.fsm.context import FSMContext
 
 from bot.keyboards.inline import get_interests_menu, get_interest_list_keyboard, get_popular_topics_keyboard
 from bot.database.db import add_interest, get_user_interests, delete_interest
+from bot.filters.relevance import get_relevance_engine
 
 
 interests_router = Router()
@@ -80,6 +81,7 @@ async def select_popular_topic(callback: CallbackQuery):
     if topic_key in POPULAR_TOPICS:
         topic_text = POPULAR_TOPICS[topic_key]
         await add_interest(callback.from_user.id, topic_text)
+        get_relevance_engine().invalidate_interests(callback.from_user.id)
         try:
             await callback.message.edit_text(
                 f"✅ Тема '{topic_text}' добавлена!\n\nВыберите еще одну тему или вернитесь в меню:",
@@ -109,6 +111,7 @@ async def receive_interest_text(message: types.Message, state: FSMContext):
     if not text or len(text) > 100:
         return await message.answer("Введите непустой текст до 100 символов.")
     await add_interest(message.from_user.id, text)
+    get_relevance_engine().invalidate_interests(message.from_user.id)
     await state.clear()
     await message.answer("Тема добавлена!", reply_markup=get_interests_menu())
 
@@ -120,6 +123,7 @@ async def delete_interest_cb(callback: CallbackQuery):
     except ValueError:
         return await callback.answer("Некорректный идентификатор", show_alert=True)
     await delete_interest(interest_id, callback.from_user.id)
+    get_relevance_engine().invalidate_interests(callback.from_user.id)
     interests = await get_user_interests(callback.from_user.id)
     text = "Тема удалена."
     try:
@@ -2,8 +2,8 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery
 
 from bot.keyboards.inline import get_schedule_menu, get_main_menu
-from bot.database.db import update_schedule, get_user, DB_PATH
-from bot.scheduler.tasks import setup_user_schedule
+from bot.database.db import update_schedule
+from bot.scheduler.tasks import schedule_slot
 
 
 schedule_router = Router()
@@ -26,17 +26,9 @@ async def schedule_off(callback: CallbackQuery):
 async def schedule_set(callback: CallbackQuery):
     time_str = callback.data.split(":", 2)[-1]
     await update_schedule(callback.from_user.id, time_str)
-    # Создать/обновить задачу в планировщике
-    user = await get_user(callback.from_user.id)
-    if user:
-        from bot.scheduler.tasks import setup_user_schedule, SCHEDULER
-        setup_user_schedule(
-            scheduler=SCHEDULER,
-            bot=callback.bot,
-            user_id=callback.from_user.id,
-            chat_id=user['chat_id'],
-            time_str=time_str,
-        )
+    # Слот общий для всех пользователей с этим временем; пользователи
+    # читаются из хранилища при запуске, так что отписка тоже учитывается
+    await schedule_slot(time_str)
     await callback.message.edit_text(f"Расписание установлено: {time_str}", reply_markup=get_main_menu())
     await callback.answer()
 
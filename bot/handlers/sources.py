@@ -7,6 +7,7 @@ from bot.keyboards.inline import get_sources_menu, get_source_list_keyboard
 from bot.database.db import add_source, get_user_sources, delete_source
 from bot.parsers.telegram_parser import validate_telegram_channel
 from bot.config import load_config
+from bot.utils.urls import normalize_channel_handle
 
 
 sources_router = Router()
@@ -88,12 +89,7 @@ async def receive_telegram_url(message: types.Message, state: FSMContext):
     config = load_config()
     
     # Нормализуем URL
-    if url.startswith("https://t.me/"):
-        url = url.replace("https://t.me/", "@")
-    elif url.startswith("t.me/"):
-        url = "@" + url.replace("t.me/", "")
-    elif not url.startswith("@"):
-        url = "@" + url
+    url = normalize_channel_handle(url)
     
     # Валидация канала
     try:
@@ -5,13 +5,31 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 
 from bot.config import load_config
-from bot.database.db import init_db, get_user
+from bot.database.backends import create_backend
+from bot.database.db import init_storage, close_storage, get_schedule_slots, configure_profile_cache
+from bot.database.writer import start_item_writer, stop_item_writer
+from bot.delivery.dispatcher import start_outbound_dispatcher, stop_outbound_dispatcher
+from bot.delivery.middleware import DeliveryMiddleware
 from bot.handlers.start import start_router
 from bot.handlers.sources import sources_router
 from bot.handlers.interests import interests_router
 from bot.handlers.digest import digest_router
 from bot.handlers.schedule import schedule_router
-from bot.scheduler.tasks import setup_user_schedule
+from bot.scheduler.tasks import (
+    schedule_slot,
+    setup_ingestion,
+    setup_relevance_refit,
+    configure_slot_runner,
+)
+from bot.scheduler.slots import start_slot_scheduler, stop_slot_scheduler
+from bot.utils.executor import init_cpu_executor, shutdown_cpu_executor
+from bot.parsers.http_client import init_http_client, close_http_client
+from bot.filters.relevance import init_relevance_engine
+from bot.parsers.telegram_parser import (
+    start_telegram_service,
+    stop_telegram_service,
+    configure_telegram_limiter,
+)
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 
@@ -23,15 +41,73 @@ async def main():
     bot = Bot(token=config.bot_token, default=DefaultBotProperties(parse_mode="HTML"))
     dp = Dispatcher()
 
+    # Все сообщения в чаты идут через общую очередь доставки с лимитами Bot API
+    await start_outbound_dispatcher(
+        config.delivery_rate,
+        config.delivery_chat_interval,
+        config.delivery_group_interval,
+    )
+    bot.session.middleware(DeliveryMiddleware())
+
     # Shared context - сохраняем в глобальных переменных
-    import bot.database.db as db_module
     import bot.scheduler.tasks as scheduler_module
-    db_module.DB_PATH = config.database_path
     scheduler_module.SCHEDULER = AsyncIOScheduler()
     scheduler_module.SCHEDULER.start()
 
-    # Init DB
-    await init_db(config.database_path)
+    # Пул для разбора страниц и TF-IDF вне потока цикла событий
+    init_cpu_executor(config.cpu_workers, use_processes=config.cpu_executor != "thread")
+
+    # Общий HTTP-клиент для парсеров
+    init_http_client(
+        timeout=config.http_timeout,
+        connect_timeout=config.http_connect_timeout,
+        limit=config.http_pool_limit,
+    )
+
+    # Init DB: хранилище из конфигурации с миграциями и долгоживущими соединениями
+    await init_storage(create_backend(config))
+    configure_profile_cache(config.profile_cache_size, config.profile_cache_ttl)
+
+    # Общий лимитер запросов к Telegram API
+    configure_telegram_limiter(config.telegram_rate, config.telegram_burst, config.telegram_max_rate)
+
+    # Постоянный клиент Telethon для всех дайджестов
+    if config.api_id and config.api_hash and config.phone_number:
+        try:
+            await start_telegram_service(
+                config.api_id,
+                config.api_hash,
+                config.phone_number,
+                workers=config.telegram_workers,
+                health_interval=config.telegram_health_interval,
+                entity_ttl=config.telegram_entity_ttl,
+            )
+        except Exception as e:
+            logging.error(f"Telegram client service not started: {e}")
+
+    # Все записи items идут через одного писателя пачками
+    await start_item_writer(config.item_writer_batch_size, config.item_writer_flush_interval)
+
+    # Модель релевантности с кэшем векторов, сохраненным при прошлой остановке
+    engine = init_relevance_engine(
+        config.relevance_cache_size,
+        config.relevance_cache_dir,
+        config.relevance_max_features,
+    )
+
+    # Пользователи слота расписания ранжируются пачками по digest_batch_size
+    configure_slot_runner(config.digest_batch_size, config.digest_slot_workers)
+
+    # Фоновый опрос источников
+    setup_ingestion(scheduler_module.SCHEDULER, config.ingestion_interval)
+    # Периодическое обучение TF-IDF модели по хранилищу
+    setup_relevance_refit(
+        scheduler_module.SCHEDULER,
+        config.relevance_refit_interval,
+        config.digest_window_hours,
+        config.relevance_corpus_size,
+        config.relevance_cache_dir,
+    )
 
     # Register routers
     dp.include_router(start_router)
@@ -40,21 +116,27 @@ async def main():
     dp.include_router(digest_router)
     dp.include_router(schedule_router)
 
-    # Restore existing user schedules
-    import aiosqlite
-    async with aiosqlite.connect(config.database_path) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM users WHERE schedule IS NOT NULL") as cursor:
-            async for row in cursor:
-                setup_user_schedule(
-                    scheduler=scheduler_module.SCHEDULER,
-                    bot=bot,
-                    user_id=row['user_id'],
-                    chat_id=row['chat_id'],
-                    time_str=row['schedule'],
-                )
-
-    await dp.start_polling(bot)
+    # Слоты рассылки хранятся в базе и общие для всех процессов бота; уже
+    # записанные слоты сохраняют время следующего запуска
+    for slot in await get_schedule_slots():
+        await schedule_slot(slot)
+    await start_slot_scheduler(bot, config.instance_id, config.slot_poll_interval, config.slot_lease_ttl)
+
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # Сначала останавливаем периодические задачи: сбор и переобучение
+        # не должны стартовать, пока закрываются пулы и хранилище
+        scheduler_module.SCHEDULER.shutdown(wait=False)
+        await stop_slot_scheduler()
+        if config.relevance_cache_dir:
+            engine.save(config.relevance_cache_dir)
+        await stop_telegram_service()
+        await close_http_client()
+        await stop_item_writer()
+        await stop_outbound_dispatcher()
+        shutdown_cpu_executor()
+        await close_storage()
 
 
 if __name__ == "__main__":
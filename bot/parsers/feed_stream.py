@@ -0,0 +1,106 @@
+from io import BytesIO
+from typing import Dict, List, Optional
+
+from lxml import etree
+
+ATOM_NS = "http://www.w3.org/2005/Atom"
+RSS1_NS = "http://purl.org/rss/1.0/"
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+# Элементы, на закрытии которых срабатывает разбор: записи и заголовок ленты
+_TAGS = [
+    "item", f"{{{RSS1_NS}}}item", f"{{{ATOM_NS}}}entry",
+    "title", f"{{{RSS1_NS}}}title", f"{{{ATOM_NS}}}title",
+]
+_FEED_ROOTS = {"rss", "feed", "RDF"}
+_FEED_PARENTS = {"channel", "feed"}
+
+
+def _text(elem: etree._Element) -> str:
+    return "".join(elem.itertext()).strip()
+
+
+def _atom_link(elem: etree._Element) -> Optional[str]:
+    rel = elem.get("rel", "alternate")
+    return elem.get("href") if rel == "alternate" else None
+
+
+def entry_fields(elem: etree._Element, source: str) -> Optional[Dict]:
+    """Нормализованная запись из элемента item (RSS 2.0 и 1.0) или entry (Atom)"""
+    values: Dict[str, str] = {}
+    link = None
+    permalink = None
+    for child in elem:
+        if not isinstance(child.tag, str):
+            # Комментарии и инструкции обработки
+            continue
+        name = etree.QName(child).localname
+        if name == "link":
+            if link is None:
+                link = _atom_link(child) if child.get("href") is not None else _text(child) or None
+        elif name not in values:
+            values[name] = _text(child)
+            # Как у feedparser: guid RSS по умолчанию — постоянная ссылка на запись
+            if name == "guid" and child.get("isPermaLink", "true").lower() != "false":
+                permalink = values[name]
+    link = link or permalink
+    if not link:
+        return None
+    return {
+        "title": values.get("title") or "Без названия",
+        "link": link,
+        "summary": values.get("description") or values.get("summary")
+                   or values.get("encoded") or values.get("content") or "",
+        # Как у feedparser: dc:date и updated — время изменения, а не публикации
+        "published": values.get("pubDate") or values.get("published") or values.get("issued"),
+        "source": source,
+        "type": "rss",
+        "guid": values.get("guid") or values.get("id") or elem.get(f"{{{RDF_NS}}}about") or link,
+    }
+
+
+def parse_feed_stream(body: bytes, limit: int, stop_guid: Optional[str] = None) -> List[Dict]:
+    """
+    Потоковый разбор RSS 2.0, RSS 1.0 и Atom: записи читаются по мере разбора,
+    и он прекращается после limit записей или на уже виденной записи stop_guid
+    (ленты отдают записи от новых к старым); остаток документа не разбирается
+
+    Raises:
+        lxml.etree.XMLSyntaxError: Документ не является корректным XML
+        ValueError: Документ не является лентой
+    """
+    items: List[Dict] = []
+    source = None
+    root = None
+    # Внешние сущности и загрузка DTD по сети отключены
+    events = etree.iterparse(
+        BytesIO(body), events=("end",), tag=_TAGS, resolve_entities=False, no_network=True
+    )
+    for _, elem in events:
+        if root is None:
+            root = elem.getroottree().getroot()
+        name = etree.QName(elem).localname
+        if name == "title":
+            parent = elem.getparent()
+            if source is None and parent is not None and etree.QName(parent).localname in _FEED_PARENTS:
+                source = _text(elem)
+            continue
+
+        entry = entry_fields(elem, source or "RSS")
+        # Разобранная запись больше не нужна: освобождаем ее и предыдущие узлы
+        elem.clear(keep_tail=True)
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+        if entry is None:
+            continue
+        if stop_guid is not None and entry["guid"] == stop_guid:
+            break
+        items.append(entry)
+        if len(items) >= limit:
+            break
+
+    if not items and (root is None or etree.QName(root).localname not in _FEED_ROOTS):
+        raise ValueError("Document is not an RSS or Atom feed")
+    return items
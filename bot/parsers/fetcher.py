@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from bot.config import Config
+from bot.parsers.rss_parser import RSSParser
+from bot.parsers.web_parser import WebParser
+from bot.parsers.telegram_parser import parse_telegram_channel
+from bot.utils.cache import TTLCache
+from bot.utils.urls import normalize_source_url
+
+logger = logging.getLogger(__name__)
+
+SourceHandler = Callable[[str], Awaitable[List[Dict]]]
+
+
+@dataclass
+class FetchResult:
+    source: Dict
+    items: List[Dict] = field(default_factory=list)
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class SourceFetcher:
+    """
+    Параллельная загрузка источников с глобальным лимитом и лимитом на хост
+
+    Args:
+        max_concurrency: Сколько источников загружается одновременно
+        per_host_limit: Сколько одновременных запросов допускается к одному хосту
+        timeout: Таймаут на один источник в секундах
+        cache_ttl: Сколько секунд результат источника считается свежим для всех пользователей
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = 20,
+            per_host_limit: int = 4,
+            timeout: float = 20.0,
+            cache_ttl: float = 300.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        # Общий кэш результатов: один URL загружается один раз за окно свежести
+        self.cache = TTLCache(cache_ttl)
+
+    @staticmethod
+    def _host_key(source: Dict) -> str:
+        if source["type"] == "telegram":
+            # Все каналы идут через один MTProto-клиент
+            return "t.me"
+        return urlparse(source["url"]).netloc.lower() or source["url"]
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        sem = self._hosts.get(host)
+        if sem is None:
+            # Запросы Telethon идут через одну сессию и общую очередь
+            limit = 1 if host == "t.me" else self.per_host_limit
+            sem = asyncio.Semaphore(limit)
+            self._hosts[host] = sem
+        return sem
+
+    async def fetch_one(
+            self,
+            source: Dict,
+            handlers: Dict[str, SourceHandler],
+            use_cache: bool = True,
+    ) -> FetchResult:
+        handler = handlers.get(source["type"])
+        if handler is None:
+            return FetchResult(source=source, error=f"no handler for type {source['type']}")
+
+        key = (source["type"], normalize_source_url(source["type"], source["url"]))
+        if not use_cache:
+            # Принудительное обновление: свежий результат заменит кэш для всех
+            self.cache.invalidate(key)
+        started = time.monotonic()
+        try:
+            items = await self.cache.get_or_load(key, lambda: self._load(source, handler))
+        except asyncio.TimeoutError:
+            return FetchResult(source=source, elapsed=time.monotonic() - started, error="timeout")
+        except Exception as e:
+            return FetchResult(source=source, elapsed=time.monotonic() - started, error=str(e))
+        return FetchResult(source=source, items=items, elapsed=time.monotonic() - started)
+
+    async def _load(self, source: Dict, handler: SourceHandler) -> List[Dict]:
+        url = source["url"]
+        async with self._global, self._host_semaphore(self._host_key(source)):
+            started = time.monotonic()
+            try:
+                items = await asyncio.wait_for(handler(url), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Timeout fetching {url} after {time.monotonic() - started:.2f}s")
+                raise
+            except Exception as e:
+                logger.warning(f"Error fetching {url} after {time.monotonic() - started:.2f}s: {e}")
+                raise
+
+        logger.info(f"Fetched {len(items or [])} items from {url} in {time.monotonic() - started:.2f}s")
+        return items or []
+
+    async def fetch_all(
+            self,
+            sources: List[Dict],
+            handlers: Dict[str, SourceHandler],
+            use_cache: bool = True,
+    ) -> List[FetchResult]:
+        """Загружает все источники одновременно, сохраняя порядок результатов"""
+        if not sources:
+            return []
+        started = time.monotonic()
+        results = await asyncio.gather(*(self.fetch_one(s, handlers, use_cache) for s in sources))
+        failed = sum(1 for r in results if not r.ok)
+        logger.info(
+            f"Fetched {len(results)} sources in {time.monotonic() - started:.2f}s "
+            f"({failed} failed, slowest {max(r.elapsed for r in results):.2f}s)"
+        )
+        return list(results)
+
+
+def build_source_handlers(config: Config) -> Dict[str, SourceHandler]:
+    """Загрузчики для каждого типа источника"""
+    rss = RSSParser(streaming=config.feed_parser != "feedparser")
+    web = WebParser()
+
+    async def fetch_telegram(url: str) -> List[Dict]:
+        if not (config.api_id and config.api_hash and config.phone_number):
+            raise RuntimeError("Telegram API not configured")
+        return await parse_telegram_channel(
+            url,
+            config.api_id,
+            config.api_hash,
+            config.phone_number,
+            limit=20  # Ограничиваем количество сообщений
+        )
+
+    return {
+        "rss": rss.parse_feed,
+        "website": web.parse_page,
+        "telegram": fetch_telegram,
+    }
+
+
+def normalize_item(item: Dict, type_: str) -> Dict:
+    """Приводит запись любого парсера к общему набору полей"""
+    return {
+        "type": item.get("type") or item.get("source_type") or type_,
+        "link": item.get("link"),
+        "title": item.get("title") or "Без названия",
+        "summary": item.get("summary") or item.get("content") or "",
+        "published": item.get("published"),
+        "source": item.get("source") or item.get("source_name") or "",
+    }
+
+
+# Глобальный экземпляр, чтобы лимиты действовали на все дайджесты сразу
+_fetcher: Optional[SourceFetcher] = None
+
+
+def get_fetcher(config: Optional[Config] = None) -> SourceFetcher:
+    """Получает глобальный экземпляр загрузчика источников"""
+    global _fetcher
+    if _fetcher is None:
+        if config is None:
+            _fetcher = SourceFetcher()
+        else:
+            _fetcher = SourceFetcher(
+                max_concurrency=config.fetch_concurrency,
+                per_host_limit=config.fetch_per_host,
+                timeout=config.fetch_timeout,
+                cache_ttl=config.fetch_cache_ttl,
+            )
+    return _fetcher
@@ -0,0 +1,169 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import aiohttp
+
+try:
+    import brotli  # noqa: F401  aiohttp сам распакует br, если модуль установлен
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+    " AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept-Encoding": _ACCEPT_ENCODING,
+}
+
+
+@dataclass
+class HttpResponse:
+    url: str
+    status: int
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+    reason: str = ""
+    request_info: Optional[aiohttp.RequestInfo] = None
+
+    def raise_for_status(self) -> None:
+        """Ошибка ответа 4xx/5xx как aiohttp.ClientResponseError, чтобы загрузчик учел источник как сбойный"""
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                self.request_info,
+                (),
+                status=self.status,
+                message=self.reason,
+                headers=self.headers,
+            )
+
+
+def conditional_headers(cached: Optional[Dict]) -> Dict[str, str]:
+    """Заголовки If-None-Match/If-Modified-Since по сохраненным валидаторам"""
+    headers: Dict[str, str] = {}
+    if not cached:
+        return headers
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+class HttpClient:
+    """
+    Общий асинхронный HTTP-клиент с пулом keep-alive соединений и кэшем DNS
+
+    Args:
+        timeout: Общий таймаут запроса в секундах
+        connect_timeout: Таймаут установки соединения в секундах
+        limit: Максимум открытых соединений в пуле
+        limit_per_host: Максимум соединений к одному хосту
+        dns_ttl: Время жизни записей DNS-кэша в секундах
+        max_body_size: Максимальный размер тела ответа в байтах
+    """
+
+    def __init__(
+            self,
+            timeout: float = 15.0,
+            connect_timeout: float = 5.0,
+            limit: int = 100,
+            limit_per_host: int = 8,
+            dns_ttl: int = 300,
+            max_body_size: int = 10 * 1024 * 1024,
+    ):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.max_body_size = max_body_size
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is not None and not self._session.closed:
+            return self._session
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.dns_ttl,
+                    enable_cleanup_closed=True,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    headers=DEFAULT_HEADERS,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+                )
+        return self._session
+
+    async def fetch(
+            self,
+            url: str,
+            headers: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None,
+    ) -> HttpResponse:
+        """
+        Загружает URL и возвращает тело ответа целиком
+
+        Args:
+            url: Адрес для загрузки
+            headers: Дополнительные заголовки запроса
+            timeout: Таймаут для этого запроса вместо общего
+
+        Returns:
+            HttpResponse со статусом, заголовками и телом
+        """
+        session = await self._get_session()
+        request_timeout = aiohttp.ClientTimeout(total=timeout, connect=self.connect_timeout) if timeout else None
+        async with session.get(url, headers=headers, timeout=request_timeout) as resp:
+            if resp.content_length and resp.content_length > self.max_body_size:
+                raise ValueError(f"Response too large: {resp.content_length} bytes")
+            chunks = []
+            size = 0
+            async for chunk in resp.content.iter_chunked(64 * 1024):
+                size += len(chunk)
+                if size > self.max_body_size:
+                    raise ValueError(f"Response too large: more than {self.max_body_size} bytes")
+                chunks.append(chunk)
+            return HttpResponse(
+                url=str(resp.url),
+                status=resp.status,
+                body=b"".join(chunks),
+                headers={k.lower(): v for k, v in resp.headers.items()},
+                reason=resp.reason or "",
+                request_info=resp.request_info,
+            )
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Глобальный экземпляр клиента
+_http_client: Optional[HttpClient] = None
+
+
+def get_http_client() -> HttpClient:
+    """Получает глобальный экземпляр HTTP-клиента"""
+    global _http_client
+    if _http_client is None:
+        _http_client = HttpClient()
+    return _http_client
+
+
+def init_http_client(timeout: float = 15.0, connect_timeout: float = 5.0, limit: int = 100) -> HttpClient:
+    """Создает глобальный HTTP-клиент с заданными настройками"""
+    global _http_client
+    _http_client = HttpClient(timeout=timeout, connect_timeout=connect_timeout, limit=limit)
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.close()
+        _http_client = None
@@ -1,35 +1,88 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import feedparser
+from lxml import etree
+
+from bot.parsers.http_client import get_http_client, conditional_headers
+from bot.database.db import get_http_cache, save_http_cache, delete_http_cache
+from bot.parsers.feed_stream import parse_feed_stream
+from bot.utils.executor import run_cpu
 
 
 class RSSParser:
-    def __init__(self, limit: int = 20):
+    def __init__(self, limit: int = 20, use_cache: bool = True, streaming: bool = True):
         self.limit = limit
+        self.use_cache = use_cache
+        self.streaming = streaming
 
     async def parse_feed(self, url: str) -> List[Dict]:
-        feed = feedparser.parse(url)
-        if feed.bozo:
-            # feed.bozo_exception may contain details
-            return []
-        items: List[Dict] = []
-        for entry in feed.entries[: self.limit]:
-            title = getattr(entry, "title", "Без названия")
-            link = getattr(entry, "link", None)
-            summary = getattr(entry, "summary", "")
-            published = getattr(entry, "published", None)
-            source_name = getattr(feed.feed, "title", "RSS")
-            if not link:
-                continue
-            items.append(
-                {
-                    "title": title,
-                    "link": link,
-                    "summary": summary,
-                    "published": published,
-                    "source": source_name,
-                    "type": "rss",
-                }
-            )
+        cached = await get_http_cache(url) if self.use_cache else None
+        resp = await get_http_client().fetch(url, headers=conditional_headers(cached))
+        if resp.status == 304 and cached is not None:
+            # Лента не менялась — отдаем ранее разобранные записи
+            return cached["items"]
+        resp.raise_for_status()
+
+        # Первая запись прошлого разбора: записи до нее новые, дальше разбирать незачем
+        stop_guid = cached["items"][0].get("guid") if cached and cached["items"] else None
+        # Разбор XML — в пуле вычислений, чтобы большая лента не останавливала цикл событий
+        items = await run_cpu(parse_feed_body, resp.body, resp.headers, self.limit, stop_guid, self.streaming)
+        # Разобраны только новые записи: в кэш идут они вместе с прежними,
+        # чтобы после следующего 304 вернулась вся лента, а не одна дельта
+        cache_items = (items + cached["items"])[:self.limit] if stop_guid else items
+        if self.use_cache and (resp.headers.get("etag") or resp.headers.get("last-modified")):
+            if cache_items:
+                await save_http_cache(url, resp.headers.get("etag"), resp.headers.get("last-modified"), cache_items)
+        elif cached is not None:
+            # Сервер перестал отдавать валидаторы: прежние больше не годятся для условных запросов
+            await delete_http_cache(url)
         return items
 
 
+def parse_feed_body(
+        body: bytes,
+        headers: Dict[str, str],
+        limit: int,
+        stop_guid: Optional[str] = None,
+        streaming: bool = True,
+) -> List[Dict]:
+    """
+    Записи ленты из загруженного тела ответа, не больше limit и только до stop_guid
+
+    Args:
+        streaming: Разбирать потоково и только нужную часть документа;
+            битые и нестандартные ленты все равно разбирает feedparser
+    """
+    if streaming:
+        try:
+            return parse_feed_stream(body, limit, stop_guid)
+        except (etree.XMLSyntaxError, ValueError):
+            pass
+    # feedparser разбирает уже загруженные байты и не ходит в сеть сам
+    feed = feedparser.parse(body, response_headers=headers)
+    if feed.bozo and not feed.entries:
+        # feed.bozo_exception may contain details
+        return []
+    items: List[Dict] = []
+    for entry in feed.entries[:limit]:
+        title = getattr(entry, "title", "Без названия")
+        link = getattr(entry, "link", None)
+        summary = getattr(entry, "summary", "")
+        published = getattr(entry, "published", None)
+        source_name = getattr(feed.feed, "title", "RSS")
+        if not link:
+            continue
+        guid = getattr(entry, "id", None) or link
+        if stop_guid is not None and guid == stop_guid:
+            break
+        items.append(
+            {
+                "title": title,
+                "link": link,
+                "summary": summary,
+                "published": published,
+                "source": source_name,
+                "type": "rss",
+                "guid": guid,
+            }
+        )
+    return items
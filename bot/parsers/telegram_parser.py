@@ -1,39 +1,118 @@
 import asyncio
 import logging
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Dict, Optional, TypeVar
+from datetime import datetime, timedelta, timezone
 from telethon import TelegramClient
-from telethon.tl.types import Channel, Chat, User
-from telethon.errors import FloodWaitError, ChannelPrivateError, ChatAdminRequiredError
+from telethon.tl.types import Channel, Chat, User, InputPeerChannel, InputPeerChat
+from telethon.errors import (
+    FloodWaitError,
+    ChannelPrivateError,
+    ChatAdminRequiredError,
+    ChannelInvalidError,
+    PeerIdInvalidError,
+)
 import random
+from dataclasses import dataclass
+
+from bot.database.db import (
+    get_telegram_watermark,
+    set_telegram_watermark,
+    get_telegram_entity,
+    save_telegram_entity,
+    delete_telegram_entity,
+)
+from bot.utils.rate_limit import AdaptiveRateLimiter
+from bot.utils.urls import normalize_channel_handle
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Общий лимитер запросов к Telegram API на весь процесс
+_telegram_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def get_telegram_limiter() -> AdaptiveRateLimiter:
+    global _telegram_limiter
+    if _telegram_limiter is None:
+        _telegram_limiter = AdaptiveRateLimiter()
+    return _telegram_limiter
+
+
+def configure_telegram_limiter(rate: float, burst: float, max_rate: float) -> AdaptiveRateLimiter:
+    global _telegram_limiter
+    _telegram_limiter = AdaptiveRateLimiter(rate=rate, burst=burst, max_rate=max_rate)
+    return _telegram_limiter
+
+
+@dataclass
+class ResolvedChannel:
+    """Разрешенный канал: InputPeer для запросов и данные для ссылок"""
+    peer: object
+    id: int
+    title: Optional[str]
+    username: Optional[str]
+
 
 class TelegramParser:
-    def __init__(self, api_id: str, api_hash: str, phone_number: str):
+    def __init__(
+            self,
+            api_id: str,
+            api_hash: str,
+            phone_number: str,
+            client: Optional[TelegramClient] = None,
+            entity_ttl: float = 7 * 86400,
+    ):
         self.api_id = api_id
         self.api_hash = api_hash
         self.phone_number = phone_number
-        self.client = None
+        self.client = client
+        # Внешний клиент принадлежит сервису, парсер его не подключает и не закрывает
+        self._owns_client = client is None
         self._session_name = "telegram_session"
-        self._request_delay = 2.0  # Минимальная задержка между запросами
-        self._last_request_time = 0
+        self.entity_ttl = entity_ttl
+        # Лимитер общий для всех экземпляров и корутин процесса
+        self.limiter = get_telegram_limiter()
 
     async def _smart_delay(self):
-        """Умная задержка между запросами с рандомизацией"""
-        current_time = asyncio.get_event_loop().time()
-        elapsed = current_time - self._last_request_time
+        """Ждет разрешения общего лимитера перед запросом к Telegram API"""
+        await self.limiter.acquire()
 
-        if elapsed < self._request_delay:
-            delay = self._request_delay - elapsed
-            # Добавляем случайность (+/- 50%)
-            delay = delay * random.uniform(0.5, 1.5)
-            await asyncio.sleep(delay)
+    async def _resolve_channel(self, channel_url: str) -> Optional[ResolvedChannel]:
+        """
+        Разрешает канал через кэш в БД; в API идет только при промахе или устаревшей записи
 
-        self._last_request_time = asyncio.get_event_loop().time()
+        Returns:
+            ResolvedChannel или None, если это не канал и не чат
+        """
+        handle = normalize_channel_handle(channel_url)
+        cached = await get_telegram_entity(handle, self.entity_ttl)
+        if cached:
+            if cached["kind"] == "channel":
+                peer = InputPeerChannel(cached["peer_id"], cached["access_hash"])
+            else:
+                peer = InputPeerChat(cached["peer_id"])
+            return ResolvedChannel(peer, cached["peer_id"], cached["title"], cached["username"])
+
+        await self._smart_delay()
+        entity = await self.client.get_entity(channel_url)
+        self.limiter.on_success()
+        return await self._remember_entity(handle, entity)
+
+    async def _remember_entity(self, handle: str, entity) -> Optional[ResolvedChannel]:
+        if isinstance(entity, Channel):
+            kind, peer = "channel", InputPeerChannel(entity.id, entity.access_hash)
+        elif isinstance(entity, Chat):
+            kind, peer = "chat", InputPeerChat(entity.id)
+        else:
+            return None
+        username = getattr(entity, "username", None)
+        await save_telegram_entity(handle, kind, entity.id, getattr(entity, "access_hash", None), entity.title, username)
+        return ResolvedChannel(peer, entity.id, entity.title, username)
 
     async def __aenter__(self):
+        if not self._owns_client:
+            return self
         if not self.api_id or not self.api_hash:
             raise ValueError("API_ID and API_HASH are required for Telegram parsing")
 
@@ -42,22 +121,26 @@ class TelegramParser:
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.client:
+        if self.client and self._owns_client:
             await self.client.disconnect()
 
     async def parse_channel(
             self,
             channel_url: str,
             limit: int = 50,
-            max_retries: int = 3
+            max_retries: int = 3,
+            min_id: int = 0
     ) -> List[Dict]:
         """
         Парсит сообщения из Telegram-канала с защитой от бана
 
         Args:
             channel_url: URL или username канала
-            limit: Максимальное количество сообщений (рекомендуется <= 50)
+            limit: Максимальное количество сообщений при первом чтении канала (рекомендуется <= 50)
             max_retries: Максимальное количество повторных попыток
+            min_id: Возвращать только сообщения с id больше этого (водяной знак); с ним
+                читаются все сообщения до водяного знака в пределах окна, а не только
+                последние limit, иначе при всплеске постов часть из них потерялась бы
 
         Returns:
             Список словарей с данными сообщений
@@ -67,27 +150,28 @@ class TelegramParser:
 
         # Ограничиваем лимит для безопасности
         limit = min(limit, 100)
+        # Telethon сам листает страницы до min_id; объем ограничен окном в 7 дней
+        fetch_limit = None if min_id else limit
 
         for attempt in range(max_retries):
             try:
-                await self._smart_delay()
-
-                entity = await self.client.get_entity(channel_url)
-
-                if not isinstance(entity, (Channel, Chat)):
+                entity = await self._resolve_channel(channel_url)
+                if entity is None:
                     logger.warning(f"Entity {channel_url} is not a channel or chat")
                     return []
 
-                since_date = datetime.now() - timedelta(days=7)
+                since_date = datetime.now(timezone.utc) - timedelta(days=7)
                 messages = []
 
-                # Добавляем задержку между итерациями
-                message_count = 0
+                await self._smart_delay()
                 async for message in self.client.iter_messages(
-                        entity,
-                        limit=limit,
-                        offset_date=since_date
+                        entity.peer,
+                        limit=fetch_limit,
+                        min_id=min_id
                 ):
+                    # Сообщения идут от новых к старым, дальше окна не читаем
+                    if message.date and message.date < since_date:
+                        break
                     if message.text:  # Только текстовые сообщения
                         message_data = {
                             'title': self._extract_title(message.text),
@@ -101,24 +185,18 @@ class TelegramParser:
                             'forwards': getattr(message, 'forwards', 0)
                         }
                         messages.append(message_data)
-                        message_count += 1
-
-                        # Задержка каждые 10 сообщений
-                        if message_count % 10 == 0:
-                            await asyncio.sleep(random.uniform(1, 2))
+                self.limiter.on_success()
 
                 logger.info(f"Parsed {len(messages)} messages from {channel_url}")
                 return messages
 
             except FloodWaitError as e:
                 logger.warning(f"FloodWait: {e.seconds}s on attempt {attempt + 1}/{max_retries}")
+                # Лимитер придержит все запросы процесса и снизит темп;
+                # следующая попытка дождется окончания блокировки в _smart_delay
+                self.limiter.on_flood_wait(e.seconds)
 
-                if attempt < max_retries - 1:
-                    # Увеличиваем задержку для следующих запросов
-                    self._request_delay = min(self._request_delay * 2, 10.0)
-                    wait_time = e.seconds + random.uniform(5, 15)
-                    await asyncio.sleep(wait_time)
-                else:
+                if attempt == max_retries - 1:
                     logger.error(f"Max retries reached for {channel_url}")
                     return []
 
@@ -126,6 +204,11 @@ class TelegramParser:
                 logger.error(f"Cannot access channel {channel_url}: {e}")
                 return []
 
+            except (ChannelInvalidError, PeerIdInvalidError) as e:
+                # Устарел access_hash в кэше — следующая попытка разрешит канал заново
+                logger.warning(f"Cached entity for {channel_url} is invalid: {e}")
+                await delete_telegram_entity(normalize_channel_handle(channel_url))
+
             except Exception as e:
                 logger.error(f"Error parsing channel {channel_url}: {e}")
                 if attempt < max_retries - 1:
@@ -164,9 +247,12 @@ class TelegramParser:
             raise RuntimeError("Telegram client not initialized")
 
         try:
-            await self._smart_delay()
-            entity = await self.client.get_entity(channel_url)
-            return isinstance(entity, (Channel, Chat))
+            # Результат сохраняется в кэше, и дайджесты не разрешают канал повторно
+            return await self._resolve_channel(channel_url) is not None
+        except FloodWaitError as e:
+            self.limiter.on_flood_wait(e.seconds)
+            logger.warning(f"Cannot validate channel {channel_url}: {e}")
+            return False
         except Exception as e:
             logger.warning(f"Cannot validate channel {channel_url}: {e}")
             return False
@@ -187,6 +273,8 @@ class TelegramParser:
         try:
             await self._smart_delay()
             entity = await self.client.get_entity(channel_url)
+            self.limiter.on_success()
+            await self._remember_entity(normalize_channel_handle(channel_url), entity)
 
             return {
                 'title': entity.title,
@@ -197,27 +285,204 @@ class TelegramParser:
                 'is_verified': getattr(entity, 'verified', False),
                 'is_broadcast': getattr(entity, 'broadcast', False)
             }
+        except FloodWaitError as e:
+            self.limiter.on_flood_wait(e.seconds)
+            logger.error(f"Error getting channel info for {channel_url}: {e}")
+            return None
         except Exception as e:
             logger.error(f"Error getting channel info for {channel_url}: {e}")
             return None
 
 
-# Глобальный экземпляр парсера
-_telegram_parser = None
+class TelegramClientService:
+    """
+    Долгоживущий клиент Telethon с очередью запросов, проверкой связи и переподключением
+
+    Args:
+        api_id: Telegram API ID
+        api_hash: Telegram API Hash
+        phone_number: Номер телефона
+        workers: Сколько запросов из очереди выполняется одновременно
+        health_interval: Период проверки соединения в секундах
+        entity_ttl: Сколько секунд кэш разрешенных каналов считается актуальным
+    """
+
+    def __init__(
+            self,
+            api_id: str,
+            api_hash: str,
+            phone_number: str,
+            workers: int = 1,
+            health_interval: float = 60.0,
+            session_name: str = "telegram_session",
+            entity_ttl: float = 7 * 86400,
+    ):
+        self.api_id = api_id
+        self.api_hash = api_hash
+        self.phone_number = phone_number
+        self.workers = workers
+        self.health_interval = health_interval
+        self.session_name = session_name
+        self.entity_ttl = entity_ttl
+        self.client: Optional[TelegramClient] = None
+        self.parser: Optional[TelegramParser] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._reconnect_lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.client is not None and bool(self._tasks)
+
+    async def start(self) -> None:
+        if not self.api_id or not self.api_hash:
+            raise ValueError("API_ID and API_HASH are required for Telegram parsing")
+        self.client = TelegramClient(self.session_name, self.api_id, self.api_hash)
+        await self.client.start(phone=self.phone_number)
+        self.parser = TelegramParser(
+            self.api_id,
+            self.api_hash,
+            self.phone_number,
+            client=self.client,
+            entity_ttl=self.entity_ttl,
+        )
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._health_loop()))
+        logger.info("Telegram client service started")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Не даем ожидающим висеть вечно
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Telegram client service stopped"))
+        if self.client:
+            await self.client.disconnect()
+        self.client = None
+        self.parser = None
+        logger.info("Telegram client service stopped")
+
+    async def submit(self, func: Callable[[TelegramParser], Awaitable[T]]) -> T:
+        """
+        Ставит запрос в общую очередь и ждет результата
+
+        Args:
+            func: Корутина-фабрика, получающая общий парсер на постоянном клиенте
+
+        Returns:
+            Результат func
+        """
+        if not self.running:
+            raise RuntimeError("Telegram client service is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((func, future))
+        return await future
+
+    async def _ensure_connected(self) -> None:
+        if self.client.is_connected():
+            return
+        async with self._reconnect_lock:
+            if self.client.is_connected():
+                return
+            logger.warning("Telegram client disconnected, reconnecting")
+            await self.client.connect()
+
+    async def _worker(self) -> None:
+        while True:
+            func, future = await self._queue.get()
+            try:
+                if future.done():
+                    continue
+                await self._ensure_connected()
+                result = await func(self.parser)
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    async def _health_loop(self) -> None:
+        backoff = 1.0
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self._ensure_connected()
+                await self.client.get_me(input_peer=True)
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Telegram health check failed: {e}")
+                try:
+                    await self.client.disconnect()
+                except Exception:
+                    pass
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+
+# Глобальный сервис клиента
+_telegram_service: Optional[TelegramClientService] = None
+
+
+def get_telegram_service() -> Optional[TelegramClientService]:
+    """Возвращает запущенный сервис клиента или None"""
+    if _telegram_service is not None and _telegram_service.running:
+        return _telegram_service
+    return None
+
+
+async def start_telegram_service(
+        api_id: str,
+        api_hash: str,
+        phone_number: str,
+        workers: int = 1,
+        health_interval: float = 60.0,
+        entity_ttl: float = 7 * 86400,
+) -> TelegramClientService:
+    global _telegram_service
+    if _telegram_service is None or not _telegram_service.running:
+        _telegram_service = TelegramClientService(
+            api_id,
+            api_hash,
+            phone_number,
+            workers=workers,
+            health_interval=health_interval,
+            entity_ttl=entity_ttl,
+        )
+        await _telegram_service.start()
+    return _telegram_service
+
+
+async def stop_telegram_service() -> None:
+    global _telegram_service
+    if _telegram_service is not None:
+        await _telegram_service.stop()
+        _telegram_service = None
 
 
 async def get_telegram_parser(api_id: str, api_hash: str, phone_number: str) -> TelegramParser:
-    """Получает глобальный экземпляр Telegram парсера"""
-    global _telegram_parser
-    if _telegram_parser is None:
-        _telegram_parser = TelegramParser(api_id, api_hash, phone_number)
-    return _telegram_parser
+    """Получает общий парсер сервиса или отдельный экземпляр, если сервис не запущен"""
+    service = get_telegram_service()
+    if service is not None:
+        return service.parser
+    return TelegramParser(api_id, api_hash, phone_number)
 
 
 async def parse_telegram_channel(channel_url: str, api_id: str, api_hash: str, phone_number: str, limit: int = 50) -> \
 List[Dict]:
     """
-    Удобная функция для парсинга одного канала
+    Удобная функция для парсинга новых сообщений одного канала
 
     Args:
         channel_url: URL канала
@@ -229,8 +494,26 @@ List[Dict]:
     Returns:
         Список сообщений из канала
     """
-    async with TelegramParser(api_id, api_hash, phone_number) as parser:
-        return await parser.parse_channel(channel_url, limit)
+    # Читаем только сообщения новее сохраненного водяного знака;
+    # старые уже лежат в хранилище items. Сам знак сдвигает commit_telegram_watermark
+    # после записи сообщений в хранилище
+    channel = normalize_channel_handle(channel_url)
+    min_id = await get_telegram_watermark(channel)
+
+    service = get_telegram_service()
+    if service is not None:
+        messages = await service.submit(lambda parser: parser.parse_channel(channel_url, limit, min_id=min_id))
+    else:
+        async with TelegramParser(api_id, api_hash, phone_number) as parser:
+            messages = await parser.parse_channel(channel_url, limit, min_id=min_id)
+    return messages
+
+
+async def commit_telegram_watermark(channel_url: str, messages: List[Dict]) -> None:
+    """Сдвигает водяной знак канала на прочитанные сообщения, уже сохраненные в хранилище"""
+    ids = [m['message_id'] for m in messages if m.get('message_id') is not None]
+    if ids:
+        await set_telegram_watermark(normalize_channel_handle(channel_url), max(ids))
 
 
 async def validate_telegram_channel(channel_url: str, api_id: str, api_hash: str, phone_number: str) -> bool:
@@ -246,5 +529,8 @@ async def validate_telegram_channel(channel_url: str, api_id: str, api_hash: str
     Returns:
         True если канал доступен
     """
+    service = get_telegram_service()
+    if service is not None:
+        return await service.submit(lambda parser: parser.validate_channel(channel_url))
     async with TelegramParser(api_id, api_hash, phone_number) as parser:
-        return await parser.validate_channel(channel_url)
\ No newline at end of file
+        return await parser.validate_channel(channel_url)
@@ -1,51 +1,63 @@
 from typing import List, Dict
-import requests
 from bs4 import BeautifulSoup
 
+from bot.parsers.http_client import get_http_client, conditional_headers
+from bot.database.db import get_http_cache, save_http_cache, delete_http_cache
+from bot.utils.executor import run_cpu
+
 
 class WebParser:
-    def __init__(self, timeout: int = 10):
+    def __init__(self, timeout: int = 10, use_cache: bool = True):
         self.timeout = timeout
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-            " AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
-        }
+        self.use_cache = use_cache
 
     async def parse_page(self, url: str) -> List[Dict]:
-        try:
-            resp = requests.get(url, headers=self.headers, timeout=self.timeout)
-            resp.raise_for_status()
-        except Exception:
-            return []
-
-        soup = BeautifulSoup(resp.text, "lxml")
-
-        # Remove scripts and styles
-        for tag in soup(["script", "style"]):
-            tag.decompose()
-
-        title_tag = soup.find(["h1", "title"]) or soup.find("h2") or soup.find("h3")
-        title = title_tag.get_text(strip=True) if title_tag else "Материал сайта"
-
-        article = soup.find(["article", "main"]) or soup.find("div", class_="content")
-        if not article:
-            article = soup
-
-        paragraphs = [p.get_text(strip=True) for p in article.find_all("p")]
-        text = " ".join(paragraphs)[:1000]
-
-        if not text:
-            text = (soup.get_text(" ", strip=True) or "")[:1000]
-
-        return [
-            {
-                "title": title,
-                "link": url,
-                "summary": text,
-                "published": None,
-                "source": url.split("/")[2] if "//" in url else url,
-                "type": "website",
-            }
-        ]
-
-
+        cached = await get_http_cache(url) if self.use_cache else None
+        resp = await get_http_client().fetch(url, headers=conditional_headers(cached), timeout=self.timeout)
+        if resp.status == 304 and cached is not None:
+            # Страница не менялась — отдаем ранее разобранный результат
+            return cached["items"]
+        resp.raise_for_status()
+
+        # Построение дерева BeautifulSoup — в пуле вычислений
+        items = await run_cpu(parse_html, resp.body, url)
+        if self.use_cache and (resp.headers.get("etag") or resp.headers.get("last-modified")):
+            await save_http_cache(url, resp.headers.get("etag"), resp.headers.get("last-modified"), items)
+        elif cached is not None:
+            # Сервер перестал отдавать валидаторы: прежние больше не годятся для условных запросов
+            await delete_http_cache(url)
+        return items
+
+
+def parse_html(body: bytes, url: str) -> List[Dict]:
+    """Заголовок и основной текст страницы одной записью"""
+    # BeautifulSoup сам определит кодировку по байтам и meta-тегам
+    soup = BeautifulSoup(body, "lxml")
+
+    # Remove scripts and styles
+    for tag in soup(["script", "style"]):
+        tag.decompose()
+
+    title_tag = soup.find(["h1", "title"]) or soup.find("h2") or soup.find("h3")
+    title = title_tag.get_text(strip=True) if title_tag else "Материал сайта"
+
+    article = soup.find(["article", "main"]) or soup.find("div", class_="content")
+    if not article:
+        article = soup
+
+    paragraphs = [p.get_text(strip=True) for p in article.find_all("p")]
+    text = " ".join(paragraphs)[:1000]
+
+    if not text:
+        text = (soup.get_text(" ", strip=True) or "")[:1000]
+
+    return [
+        {
+            "title": title,
+            "link": url,
+            "summary": text,
+            "published": None,
+            "source": url.split("/")[2] if "//" in url else url,
+            "type": "website",
+        }
+    ]
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from bot.config import Config, load_config
+from bot.database.db import get_due_feeds, update_feed_poll, delete_old_items
+from bot.database.writer import get_item_writer
+from bot.parsers.fetcher import FetchResult, get_fetcher, build_source_handlers, normalize_item
+from bot.parsers.telegram_parser import commit_telegram_watermark
+
+logger = logging.getLogger(__name__)
+
+
+def next_poll_interval(current: int, new_items: int, ok: bool, min_interval: int, max_interval: int) -> int:
+    """
+    Адаптивный интервал опроса: чаще для активных источников, реже для молчащих
+
+    Args:
+        current: Текущий интервал в секундах
+        new_items: Сколько новых записей принес последний опрос
+        ok: Успешен ли последний опрос
+        min_interval: Нижняя граница интервала
+        max_interval: Верхняя граница интервала
+    """
+    if not ok:
+        interval = current * 2
+    elif new_items > 0:
+        interval = current // 2
+    else:
+        interval = int(current * 1.5)
+    return max(min_interval, min(max_interval, interval))
+
+
+async def store_results(results: List[FetchResult]) -> Dict[int, int]:
+    """Сохраняет успешные результаты загрузки в items, возвращает число новых записей по feed_id"""
+    writer = get_item_writer()
+    fetched_at = time.time()
+    feed_ids = []
+    writes = []
+    stored = []
+    for result in results:
+        feed_id = result.source.get("feed_id")
+        if not result.ok or feed_id is None:
+            continue
+        items = [normalize_item(it, result.source["type"]) for it in result.items]
+        items = [it for it in items if it["link"]]
+        feed_ids.append(feed_id)
+        writes.append(writer.write(feed_id, items, fetched_at))
+        stored.append(result)
+    # Все источники цикла попадают в общие пачки писателя; ошибка одной пачки
+    # не должна срывать запись остальных источников
+    counts = await asyncio.gather(*writes, return_exceptions=True)
+    new_counts: Dict[int, int] = {}
+    for feed_id, result, count in zip(feed_ids, stored, counts):
+        if isinstance(count, BaseException):
+            logger.error(f"Failed to store items of {result.source['url']}: {count}")
+            continue
+        new_counts[feed_id] = count
+        # Водяные знаки Telegram сдвигаются только после записи: при ошибке записи
+        # эти сообщения будут прочитаны снова
+        if result.source["type"] == "telegram":
+            await commit_telegram_watermark(result.source["url"], result.items)
+    return new_counts
+
+
+class IngestionWorker:
+    """
+    Фоновый опрос всех уникальных источников и запись их в хранилище items
+
+    Args:
+        config: Конфигурация бота
+        batch_size: Сколько источников опрашивается за один цикл
+    """
+
+    def __init__(self, config: Config, batch_size: int = 100):
+        self.config = config
+        self.batch_size = batch_size
+        self._last_cleanup = 0.0
+
+    async def run_once(self) -> int:
+        """Один цикл опроса, возвращает количество опрошенных источников"""
+        feeds = await get_due_feeds(limit=self.batch_size)
+        if feeds:
+            fetcher = get_fetcher(self.config)
+            handlers = build_source_handlers(self.config)
+            results = await fetcher.fetch_all(feeds, handlers, use_cache=False)
+            new_counts = await store_results(results)
+
+            polled_at = time.time()
+            for result in results:
+                feed = result.source
+                interval = next_poll_interval(
+                    feed["poll_interval"],
+                    new_counts.get(feed["feed_id"], 0),
+                    result.ok,
+                    self.config.poll_min_interval,
+                    self.config.poll_max_interval,
+                )
+                await update_feed_poll(feed["feed_id"], polled_at, interval)
+            logger.info(f"Ingestion: polled {len(feeds)} feeds, {sum(new_counts.values())} new items")
+
+        if time.time() - self._last_cleanup > 3600:
+            await delete_old_items(time.time() - self.config.items_retention_days * 86400)
+            self._last_cleanup = time.time()
+        return len(feeds)
+
+
+# Глобальный экземпляр воркера
+_worker: Optional[IngestionWorker] = None
+
+
+def get_ingestion_worker(config: Optional[Config] = None) -> IngestionWorker:
+    global _worker
+    if _worker is None:
+        _worker = IngestionWorker(config or load_config())
+    return _worker
+
+
+async def run_ingestion_cycle() -> None:
+    try:
+        await get_ingestion_worker().run_once()
+    except Exception as e:
+        logger.error(f"Ingestion cycle failed: {e}")
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Dict, Optional
+
+from aiogram import Bot
+
+from bot.database.db import (
+    claim_digest_slots,
+    renew_slot_lease,
+    complete_digest_slot,
+    release_digest_slot,
+    delete_digest_slot,
+)
+from bot.scheduler.tasks import get_slot_runner, next_slot_run
+
+logger = logging.getLogger(__name__)
+
+
+def default_instance_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SlotScheduler:
+    """
+    Запуск слотов рассылки из общего расписания в хранилище
+
+    Несколько процессов бота опрашивают одну таблицу digest_slots. Слот,
+    который пора запускать, берется в аренду одним процессом; пока слот
+    рассылается, аренда продлевается. Если процесс упал, аренда истекает
+    и слот забирает другой процесс, а журнал доставки не дает отправить
+    дайджест повторно тем, кто его уже получил.
+
+    Args:
+        bot: Бот для отправки дайджестов
+        owner: Идентификатор процесса в арендах
+        poll_interval: Как часто проверять расписание, секунд
+        lease_ttl: Срок аренды слота, секунд; продлевается каждую треть срока
+        max_slots: Сколько слотов процесс рассылает одновременно
+        misfire_grace: Насколько можно опоздать с запуском; более старые
+            запуски пропускаются (например, если все процессы были остановлены)
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            owner: str,
+            poll_interval: float = 15.0,
+            lease_ttl: float = 60.0,
+            max_slots: int = 2,
+            misfire_grace: float = 3600.0,
+    ):
+        self.bot = bot
+        self.owner = owner
+        self.poll_interval = poll_interval
+        self.lease_ttl = lease_ttl
+        self.max_slots = max_slots
+        self.misfire_grace = misfire_grace
+        self._running: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(self._task, *self._running.values(), return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Slot scheduler poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll(self) -> int:
+        """
+        Берет в аренду и запускает слоты, которые пора рассылать
+
+        Returns:
+            Сколько слотов запущено
+        """
+        free = self.max_slots - len(self._running)
+        if free <= 0:
+            return 0
+        claimed = await claim_digest_slots(self.owner, self.lease_ttl, free)
+        for row in claimed:
+            slot = row["slot"]
+            task = asyncio.create_task(self._execute(slot, row["next_run_at"]))
+            self._running[slot] = task
+            task.add_done_callback(lambda _, slot=slot: self._running.pop(slot, None))
+        return len(claimed)
+
+    async def _execute(self, slot: str, run_at: float) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(slot, asyncio.current_task()))
+        try:
+            late = time.time() - run_at
+            if late > self.misfire_grace:
+                logger.warning(f"Slot {slot}: skipping run {late:.0f}s late")
+            elif await get_slot_runner().run(self.bot, slot, run_at) == 0:
+                # Все пользователи слота отписались или сменили время
+                if await delete_digest_slot(slot, self.owner):
+                    return
+            next_run_at = next_slot_run(slot, max(time.time(), run_at + 1))
+            await complete_digest_slot(slot, self.owner, next_run_at)
+        except asyncio.CancelledError:
+            # Остановка процесса или потерянная аренда: журнал доставки
+            # позволит следующему владельцу продолжить с того же места
+            await asyncio.shield(release_digest_slot(slot, self.owner))
+            raise
+        except Exception as e:
+            # Аренда не снимается: слот повторится, когда она истечет
+            logger.error(f"Slot {slot} failed: {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, slot: str, task: asyncio.Task) -> None:
+        loop = asyncio.get_running_loop()
+        step = self.lease_ttl / 3
+        # Аренда отсчитывается от отправки запроса на продление
+        renewed_at = loop.time()
+        while True:
+            await asyncio.sleep(step)
+            attempted_at = loop.time()
+            try:
+                renewed = await asyncio.wait_for(renew_slot_lease(slot, self.owner, self.lease_ttl), step)
+            except Exception as e:
+                logger.warning(f"Slot {slot}: lease renewal failed: {e!r}")
+                # Если аренда истечет до следующей попытки, ее может забрать
+                # другой процесс: дальше рассылать нельзя, иначе дайджесты уйдут дважды
+                if loop.time() + step - renewed_at >= self.lease_ttl:
+                    logger.warning(f"Slot {slot}: lease is about to expire, stopping")
+                    task.cancel()
+                    return
+                continue
+            renewed_at = attempted_at
+            if not renewed:
+                logger.warning(f"Slot {slot}: lease lost, stopping")
+                task.cancel()
+                return
+
+
+# Глобальный планировщик слотов
+_slot_scheduler: Optional[SlotScheduler] = None
+
+
+async def start_slot_scheduler(
+        bot: Bot,
+        owner: str = "",
+        poll_interval: float = 15.0,
+        lease_ttl: float = 60.0,
+) -> SlotScheduler:
+    global _slot_scheduler
+    _slot_scheduler = SlotScheduler(bot, owner or default_instance_id(), poll_interval, lease_ttl)
+    await _slot_scheduler.start()
+    return _slot_scheduler
+
+
+async def stop_slot_scheduler() -> None:
+    global _slot_scheduler
+    if _slot_scheduler is not None:
+        await _slot_scheduler.stop()
+        _slot_scheduler = None
@@ -1,11 +1,26 @@
-from typing import Optional
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from aiogram import Bot
 
-from bot.handlers.digest import collect_items, format_digest
-from bot.database.db import get_user_interests, DB_PATH
-from bot.filters.content_filter import ContentFilter
+from bot.delivery.dispatcher import delivery_priority, PRIORITY_SCHEDULED
+from bot.handlers.digest import build_digests_batch, format_digest
+from bot.database.db import (
+    get_recent_items,
+    iter_slot_users,
+    get_delivered_users,
+    mark_delivered,
+    save_digest_slot,
+)
+from bot.filters.relevance import get_relevance_engine, item_text
+from bot.scheduler.ingestion import run_ingestion_cycle
+
+logger = logging.getLogger(__name__)
 
 # Глобальная переменная для планировщика
 SCHEDULER = None
@@ -23,43 +38,178 @@ def parse_time_str(time_str: str) -> Optional[tuple]:
     return None
 
 
-async def send_scheduled_digest(bot: Bot, user_id: int, chat_id: int):
-    items = await collect_items(user_id)
-    interests = await get_user_interests(user_id)
-    interests_list = [i['interest_text'] for i in interests]
-    filtered = ContentFilter().filter_by_interests(items, interests_list)
-    text = format_digest(filtered)
-    await bot.send_message(chat_id, text, parse_mode="Markdown")
+class SlotRunner:
+    """
+    Рассылка дайджестов одного слота расписания (времени HH:MM)
 
+    Пользователи слота читаются из хранилища страницами, для каждой страницы
+    дайджесты строятся одним проходом ранжирования. Одновременно
+    обрабатывается не больше workers страниц: следующая страница читается,
+    только когда освободился обработчик, поэтому память не растет с числом
+    подписчиков слота.
 
-def setup_user_schedule(scheduler: AsyncIOScheduler, bot: Bot, user_id: int, chat_id: int, time_str: Optional[str]):
-    # Remove previous job if exists
-    job_id = f"digest_{user_id}"
-    try:
-        job = scheduler.get_job(job_id)
-        if job:
-            scheduler.remove_job(job_id)
-    except Exception:
-        pass
+    Если задан run_at, отправленные дайджесты отмечаются в журнале доставки,
+    и при повторном запуске того же слота (после падения процесса, который
+    его держал) уже получившие дайджест пользователи пропускаются.
 
-    if not time_str:
-        return
+    Args:
+        batch_size: Пользователей на страницу
+        workers: Сколько страниц обрабатывать одновременно
+    """
+
+    def __init__(self, batch_size: int = 500, workers: int = 4):
+        self.batch_size = batch_size
+        self.workers = workers
+
+    async def run(self, bot: Bot, slot: str, run_at: Optional[float] = None) -> int:
+        """
+        Returns:
+            Сколько пользователей было в слоте
+        """
+        sem = asyncio.Semaphore(self.workers)
+        tasks: Set[asyncio.Task] = set()
+        total = 0
+        started = time.monotonic()
+        pages = iter_slot_users(slot, self.batch_size)
+        while True:
+            await sem.acquire()
+            try:
+                users = await pages.__anext__()
+            except StopAsyncIteration:
+                sem.release()
+                break
+            except BaseException:
+                sem.release()
+                raise
+            total += len(users)
+            task = asyncio.create_task(self._process(bot, slot, run_at, users, sem))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        logger.info(f"Slot {slot}: {total} digests in {time.monotonic() - started:.1f}s")
+        return total
+
+    async def _process(
+            self,
+            bot: Bot,
+            slot: str,
+            run_at: Optional[float],
+            users: List[Dict],
+            sem: asyncio.Semaphore,
+    ) -> None:
+        try:
+            if run_at is not None:
+                done = set(await get_delivered_users(slot, run_at, [u["user_id"] for u in users]))
+                users = [u for u in users if u["user_id"] not in done]
+                if not users:
+                    return
+            try:
+                digests = await build_digests_batch([u["user_id"] for u in users])
+            except Exception as e:
+                logger.error(f"Batch digest for {len(users)} users failed: {e}")
+                return
+
+            async def deliver(user: Dict) -> Optional[int]:
+                try:
+                    text = format_digest(digests.get(user["user_id"], []))
+                    await bot.send_message(user["chat_id"], text, parse_mode="Markdown")
+                    return user["user_id"]
+                except Exception as e:
+                    logger.error(f"Scheduled digest for user {user['user_id']} failed: {e}")
+                    return None
 
+            # Все дайджесты страницы сразу ставятся в очередь доставки, она сама держит темп;
+            # ответы на команды пользователей обгоняют плановую рассылку
+            with delivery_priority(PRIORITY_SCHEDULED):
+                results = await asyncio.gather(*(deliver(u) for u in users))
+            delivered = [user_id for user_id in results if user_id is not None]
+            if run_at is not None and delivered:
+                await mark_delivered(slot, run_at, delivered)
+        finally:
+            sem.release()
+
+
+_runner: Optional[SlotRunner] = None
+
+
+def get_slot_runner() -> SlotRunner:
+    global _runner
+    if _runner is None:
+        _runner = SlotRunner()
+    return _runner
+
+
+def configure_slot_runner(batch_size: int, workers: int) -> SlotRunner:
+    global _runner
+    _runner = SlotRunner(batch_size, workers)
+    return _runner
+
+
+def next_slot_run(time_str: str, after: Optional[float] = None) -> Optional[float]:
+    """Ближайшее после after (по умолчанию — сейчас) время срабатывания слота, unix time"""
     hm = parse_time_str(time_str)
     if not hm:
-        return
+        return None
     hour, minute = hm
-
     trigger = CronTrigger(hour=hour, minute=minute)
+    now = datetime.fromtimestamp(after if after is not None else time.time(), tz=trigger.timezone)
+    return trigger.get_next_fire_time(None, now).timestamp()
+
+
+async def schedule_slot(time_str: Optional[str]):
+    """
+    Записывает время рассылки в общее расписание; одна запись на каждое
+    время, а не на каждого пользователя, повторный вызов ничего не меняет
+    """
+    if not time_str:
+        return
+    next_run_at = next_slot_run(time_str)
+    if next_run_at is None:
+        return
+    await save_digest_slot(time_str, next_run_at)
+
+
+def setup_ingestion(scheduler: AsyncIOScheduler, interval_seconds: int):
+    """Периодический фоновый опрос источников заранее, до запроса дайджеста"""
     scheduler.add_job(
-        send_scheduled_digest,
-        id=job_id,
-        trigger=trigger,
-        kwargs={"bot": bot, "user_id": user_id, "chat_id": chat_id},
+        run_ingestion_cycle,
+        id="ingestion",
+        trigger=IntervalTrigger(seconds=interval_seconds),
         replace_existing=True,
         max_instances=1,
         coalesce=True,
-        misfire_grace_time=60,
+        next_run_time=datetime.now(),
     )
 
 
+async def refit_relevance_model(window_hours: int, corpus_size: int, cache_dir: str = ""):
+    """Переобучает общую TF-IDF модель по свежим записям из хранилища"""
+    try:
+        items = await get_recent_items(time.time() - window_hours * 3600, corpus_size)
+        texts = [item_text(it) for it in items]
+        engine = get_relevance_engine()
+        # Обучение в пуле вычислений, чтобы не останавливать обработку апдейтов
+        if await engine.refit(texts) and cache_dir:
+            await asyncio.to_thread(engine.save, cache_dir)
+    except Exception as e:
+        logger.error(f"Relevance model refit failed: {e}")
+
+
+def setup_relevance_refit(
+        scheduler: AsyncIOScheduler,
+        interval_seconds: int,
+        window_hours: int,
+        corpus_size: int,
+        cache_dir: str = "",
+):
+    scheduler.add_job(
+        refit_relevance_model,
+        id="relevance_refit",
+        trigger=IntervalTrigger(seconds=interval_seconds),
+        kwargs={"window_hours": window_hours, "corpus_size": corpus_size, "cache_dir": cache_dir},
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.now(),
+    )
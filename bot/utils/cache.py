@@ -0,0 +1,211 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Кэш в памяти с временем жизни записей и объединением одновременных загрузок
+
+    Args:
+        ttl: Время жизни записи в секундах
+        maxsize: Максимальное количество записей, старые вытесняются первыми
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Возвращает значение из кэша или загружает его один раз для всех ожидающих
+
+        Args:
+            key: Ключ записи
+            loader: Корутина-фабрика, вызываемая при промахе
+
+        Returns:
+            Закэшированное или только что загруженное значение
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Загрузивший отменен — пробуем загрузить сами
+                return await self.get_or_load(key, loader)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение уже передано ожидающим, не даем ему "потеряться"
+            future.exception()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._pending.pop(key, None)
+
+
+class LRUCache:
+    """
+    Кэш в памяти ограниченного размера с вытеснением давно не использованных записей
+
+    Ведет счетчики попаданий, промахов и вытеснений для подбора размера.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def items(self):
+        return list(self._data.items())
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+_MISSING = object()
+
+
+class ReadThroughCache:
+    """
+    LRU-кэш перед хранилищем: промах загружается из него, запись в хранилище
+    сбрасывает ключ
+
+    Если ключ сбросили, пока шла его загрузка, загруженное значение может быть
+    уже устаревшим и в кэш не кладется. Записи в хранилище другими процессами
+    сбросить ключ не могут, поэтому для общего хранилища задается ttl.
+
+    Args:
+        maxsize: Максимальное количество записей
+        ttl: Время жизни записи в секундах; 0 — без ограничения
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 0):
+        self.ttl = ttl
+        self._cache = LRUCache(maxsize)
+        self._loading: Dict[Hashable, int] = {}
+        self._stale: set = set()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._cache.get(key, _MISSING)
+        if entry is not _MISSING:
+            expires_at, value = entry
+            if not self.ttl or expires_at > time.monotonic():
+                return value
+            self._cache.invalidate(key)
+
+        self._loading[key] = self._loading.get(key, 0) + 1
+        try:
+            value = await loader()
+        finally:
+            stale = key in self._stale
+            self._loading[key] -= 1
+            if not self._loading[key]:
+                del self._loading[key]
+                self._stale.discard(key)
+        if not stale:
+            self._cache.set(key, (time.monotonic() + self.ttl, value))
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        self._cache.invalidate(key)
+        if key in self._loading:
+            self._stale.add(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._stale.update(self._loading)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CPUExecutor:
+    """
+    Пул для тяжелых вычислений (разбор HTML и XML, обучение и применение TF-IDF),
+    чтобы они не занимали поток цикла событий
+
+    Функции и их аргументы передаются в процессы через pickle, поэтому
+    в пул отправляются только функции уровня модуля с простыми данными.
+    Процессы запускаются через spawn: fork процесса с работающим циклом
+    событий и потоками aiosqlite небезопасен. Если процессы создать
+    нельзя, используется пул потоков.
+
+    Args:
+        workers: Размер пула; 0 — по числу доступных ядер
+        use_processes: False — пул потоков (для отладки и окружений без процессов)
+    """
+
+    def __init__(self, workers: int = 0, use_processes: bool = True):
+        self.workers = workers or available_cpus()
+        self.use_processes = use_processes
+        self._pool: Optional[Executor] = None
+        self.submitted = 0
+        self.restarts = 0
+
+    @property
+    def mode(self) -> str:
+        return "process" if isinstance(self._pool, ProcessPoolExecutor) else "thread"
+
+    def _create_pool(self) -> Executor:
+        if self.use_processes:
+            try:
+                return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, NotImplementedError, ImportError) as e:
+                logger.warning(f"Process pool is unavailable, falling back to threads: {e}")
+        return ThreadPoolExecutor(self.workers, thread_name_prefix="cpu")
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            self._pool = self._create_pool()
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Выполняет fn(*args) в пуле и ждет результата, не блокируя цикл событий"""
+        loop = asyncio.get_running_loop()
+        self.submitted += 1
+        pool = self._get_pool()
+        try:
+            return await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # Процесс пула упал (например, по памяти): пересоздаем пул и повторяем один раз.
+            # Все задачи сломанного пула падают разом; пул пересоздает только первая из них,
+            # остальные повторяют на уже новом, не закрывая его
+            if self._pool is pool:
+                logger.error("CPU process pool is broken, restarting")
+                self.restarts += 1
+                self._shutdown_pool(wait=False)
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "restarts": self.restarts,
+        }
+
+    def _shutdown_pool(self, wait: bool) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+    def shutdown(self) -> None:
+        self._shutdown_pool(wait=True)
+
+
+def available_cpus() -> int:
+    """Ядра, доступные процессу (с учетом affinity в контейнерах)"""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Глобальный пул; без init_cpu_executor — потоки, чтобы скрипты и отладка
+# не порождали процессы
+_executor: Optional[CPUExecutor] = None
+
+
+def get_cpu_executor() -> CPUExecutor:
+    global _executor
+    if _executor is None:
+        _executor = CPUExecutor(use_processes=False)
+    return _executor
+
+
+def init_cpu_executor(workers: int = 0, use_processes: bool = True) -> CPUExecutor:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+    _executor = CPUExecutor(workers, use_processes)
+    return _executor
+
+
+def shutdown_cpu_executor() -> None:
+    global _executor
+    if _executor is not None:
+        logger.info(f"CPU executor stats: {_executor.stats()}")
+        _executor.shutdown()
+        _executor = None
+
+
+async def run_cpu(fn: Callable[..., Any], *args: Any) -> Any:
+    return await get_cpu_executor().run(fn, *args)
@@ -0,0 +1,87 @@
+import asyncio
+import random
+import time
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket: в среднем rate операций в секунду, всплеск до capacity
+
+    Ожидающие обслуживаются по очереди, поэтому лимит общий для всех корутин.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class AdaptiveRateLimiter:
+    """
+    Общий лимитер, который учится на FloodWait: при ошибке блокирует все
+    запросы на указанное время и вдвое снижает темп, после успешных запросов
+    постепенно возвращает его к максимуму (AIMD)
+
+    Args:
+        rate: Начальный темп, запросов в секунду
+        burst: Размер всплеска
+        min_rate: Нижняя граница темпа
+        max_rate: Верхняя граница темпа
+        increase: На сколько поднимается темп после каждого успешного запроса
+        jitter: Случайная добавка к ожиданию в секундах, чтобы запросы не шли строем
+    """
+
+    def __init__(
+            self,
+            rate: float = 0.5,
+            burst: float = 3.0,
+            min_rate: float = 0.05,
+            max_rate: float = 2.0,
+            increase: float = 0.02,
+            jitter: float = 0.5,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.jitter = jitter
+        self.bucket = TokenBucket(rate, burst)
+        self._blocked_until = 0.0
+        self.flood_waits = 0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    async def acquire(self) -> None:
+        while True:
+            delay = self._blocked_until - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        await self.bucket.acquire()
+        if self.jitter:
+            await asyncio.sleep(random.uniform(0, self.jitter))
+
+    def on_success(self) -> None:
+        self.bucket.rate = min(self.max_rate, self.bucket.rate + self.increase)
+
+    def on_flood_wait(self, seconds: float) -> None:
+        self.flood_waits += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
@@ -0,0 +1,49 @@
+from urllib.parse import urlsplit, urlunsplit, unquote_plus
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Приводит URL к каноническому виду, чтобы одинаковые источники совпадали
+
+    Схема и хост в нижнем регистре, без порта по умолчанию, фрагмента
+    и utm-меток; пустой путь заменяется на "/".
+    """
+    url = url.strip()
+    parts = urlsplit(url)
+    if not parts.scheme or not parts.netloc:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+
+    # Остальные параметры переносятся как есть: пересборка запроса меняет
+    # кодировку и пустые значения, а значит и сам адрес
+    query = "&".join(
+        pair for pair in parts.query.split("&")
+        if not unquote_plus(pair.split("=", 1)[0]).lower().startswith("utm_")
+    ) if parts.query else ""
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def normalize_channel_handle(url: str) -> str:
+    """Приводит ссылку на Telegram-канал к виду @username"""
+    url = url.strip()
+    for prefix in ("https://t.me/", "http://t.me/", "t.me/"):
+        if url.startswith(prefix):
+            url = url[len(prefix):]
+            break
+    url = url.strip("/").lstrip("@")
+    return "@" + url.lower()
+
+
+def normalize_source_url(type_: str, url: str) -> str:
+    if type_ == "telegram":
+        return normalize_channel_handle(url)
+    return normalize_url(url)
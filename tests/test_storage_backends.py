@@ -0,0 +1,165 @@
+"""
+Общий контракт хранилищ: одни и те же сценарии для SQLite и PostgreSQL
+
+PostgreSQL проверяется, только если задана TEST_DATABASE_URL; тест очищает
+таблицы бота в этой базе.
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from bot.database.backends import SQLiteBackend
+
+_PG_TABLES = (
+    "users, feeds, sources, interests, http_cache, items, telegram_watermarks, "
+    "telegram_entities, digest_slots, digest_deliveries"
+)
+
+
+async def _open_backend(kind, tmp_path):
+    if kind == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "bot.db"), pool_size=2)
+        await backend.open()
+        return backend
+    from bot.database.backends.postgres import PostgresBackend
+    backend = PostgresBackend(os.environ["TEST_DATABASE_URL"], pool_size=2)
+    await backend.open()
+    await backend._execute(f"TRUNCATE {_PG_TABLES} RESTART IDENTITY CASCADE")
+    return backend
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def run(request, tmp_path):
+    """Запускает сценарий scenario(backend) на открытом хранилище"""
+    if request.param == "postgres":
+        if not os.environ.get("TEST_DATABASE_URL"):
+            pytest.skip("TEST_DATABASE_URL is not set")
+        pytest.importorskip("asyncpg")
+
+    def runner(scenario):
+        async def main():
+            backend = await _open_backend(request.param, tmp_path)
+            try:
+                await scenario(backend)
+            finally:
+                await backend.close()
+
+        asyncio.run(main())
+
+    return runner
+
+
+def _item(link, title="Заголовок", summary=""):
+    return {
+        "type": "rss",
+        "link": link,
+        "title": title,
+        "summary": summary,
+        "published": None,
+        "source": "Лента",
+    }
+
+
+async def _subscribe(backend, user_id, url):
+    await backend.add_user(user_id, user_id)
+    await backend.add_source(user_id, "rss", url)
+    sources = await backend.get_user_sources(user_id)
+    return next(s["feed_id"] for s in sources if s["url"] == url)
+
+
+def test_save_items_batch_counts_only_new_items(run):
+    async def scenario(backend):
+        feed_a = await _subscribe(backend, 1, "https://a.example/rss")
+        feed_b = await _subscribe(backend, 1, "https://b.example/rss")
+        now = time.time()
+
+        counts = await backend.save_items_batch([
+            (feed_a, [_item("https://a.example/1"), _item("https://a.example/2")], now),
+            (feed_b, [], now),
+        ])
+        assert counts == [2, 0]
+
+        # Повтор не считается новым, измененный заголовок обновляет запись
+        counts = await backend.save_items_batch([
+            (feed_a, [_item("https://a.example/1", "Новый заголовок"), _item("https://a.example/2")], now),
+            (feed_b, [_item("https://b.example/1")], now),
+        ])
+        assert counts == [0, 1]
+
+        items = {it["link"]: it for it in await backend.get_user_items(1, now - 1, 100)}
+        assert len(items) == 3
+        assert items["https://a.example/1"]["title"] == "Новый заголовок"
+
+    run(scenario)
+
+
+def test_digest_slot_leases(run):
+    async def scenario(backend):
+        now = time.time()
+        await backend.save_digest_slot("09:00", now - 1)
+        await backend.save_digest_slot("10:00", now + 3600)
+
+        claimed = await backend.claim_digest_slots("a", now, now + 60, 5)
+        assert [row["slot"] for row in claimed] == ["09:00"]
+        # Занятый слот не достается второму процессу
+        assert await backend.claim_digest_slots("b", now, now + 60, 5) == []
+
+        assert await backend.renew_slot_lease("09:00", "a", now + 90)
+        assert not await backend.renew_slot_lease("09:00", "b", now + 90)
+
+        # После истечения аренды слот забирает другой процесс, прежний ее теряет
+        later = now + 120
+        claimed = await backend.claim_digest_slots("b", later, later + 60, 5)
+        assert [row["slot"] for row in claimed] == ["09:00"]
+        assert not await backend.renew_slot_lease("09:00", "a", later + 90)
+        assert await backend.renew_slot_lease("09:00", "b", later + 90)
+
+    run(scenario)
+
+
+def test_search_user_items_matches_word_forms_of_own_sources(run):
+    async def scenario(backend):
+        feed_1 = await _subscribe(backend, 1, "https://a.example/rss")
+        feed_2 = await _subscribe(backend, 2, "https://b.example/rss")
+        now = time.time()
+        await backend.save_items_batch([
+            (feed_1, [
+                _item("https://a.example/1", "Новые технологии хранения"),
+                _item("https://a.example/2", "Прогноз погоды"),
+            ], now),
+            (feed_2, [_item("https://b.example/1", "Технологии чужого источника")], now),
+        ])
+        # Старая запись не попадает в окно поиска
+        await backend.save_items_batch([
+            (feed_1, [_item("https://a.example/3", "Технология прошлого года")], now - 3600),
+        ])
+
+        found = await backend.search_user_items(1, ["технология"], now - 60, 10)
+        assert [it["link"] for it in found] == ["https://a.example/1"]
+        assert await backend.search_user_items(1, ["-"], now - 60, 10) == []
+
+    run(scenario)
+
+
+def test_update_feed_poll_reports_first_poll_subscribers(run):
+    async def scenario(backend):
+        feed_id = await _subscribe(backend, 1, "https://a.example/rss")
+        await backend.add_user(2, 2)
+        await backend.add_source(2, "rss", "https://a.example/rss")
+        now = time.time()
+
+        assert [f["feed_id"] for f in await backend.get_due_feeds(now, 10)] == [feed_id]
+
+        assert sorted(await backend.update_feed_poll(feed_id, now, 600)) == [1, 2]
+        # Повторный опрос уже не меняет last_polled_at с NULL
+        assert await backend.update_feed_poll(feed_id, now, 600) == []
+
+        sources = await backend.get_user_sources(1)
+        assert sources[0]["last_polled_at"] == pytest.approx(now)
+        assert sources[0]["poll_interval"] == 600
+        assert await backend.get_due_feeds(now + 599, 10) == []
+        assert [f["feed_id"] for f in await backend.get_due_feeds(now + 601, 10)] == [feed_id]
+
+    run(scenario)